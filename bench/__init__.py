@@ -0,0 +1,10 @@
+"""
+Offline benchmark and load-test harness.
+
+Drives the real bot and cogs with fake Discord objects and local stub upstreams, so performance can be
+measured without a Discord connection or any network access. Run it from the repository root:
+
+    python -m bench                       # every scenario
+    python -m bench currency graphs       # a subset
+    python -m bench --json results.json   # also save the numbers for later comparison
+"""
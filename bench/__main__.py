@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import json
+
+# Imported first: sets up the environment config needs and the import path
+from bench.harness import BenchBot, point_config_at
+from bench.fakes import FakeDiscord, FakeGeminiModel
+from bench.metrics import LoopLagProbe, MemoryProbe
+from bench.scenarios import SCENARIOS
+from bench.stubs import StubUpstreams
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m bench', description="Offline load tests for the bot.")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--messages', type=int, default=5000, help="Messages in the currency burst")
+    parser.add_argument('--users', type=int, default=10000, help="Registered users in the horoscope broadcast")
+    parser.add_argument('--broadcast-rate', type=float, default=0, help="Broadcast REST calls per second (0: unthrottled)")
+    parser.add_argument('--clicks', type=int, default=300, help="Graph button clicks in the click storm")
+    parser.add_argument('--mentions', type=int, default=1000, help="Mentions in the AI flood")
+    parser.add_argument('--ai-users', type=int, default=200, help="Distinct users sending the AI flood")
+    parser.add_argument('--drain-timeout', type=float, default=30, help="Seconds to wait for admitted AI prompts to be answered")
+    parser.add_argument('--concurrency', type=int, default=50, help="Handlers in flight at once")
+    parser.add_argument('--upstream-latency', type=float, default=0.05, help="Seconds each stub upstream response takes")
+    parser.add_argument('--discord-latency', type=float, default=0.02, help="Seconds each fake Discord REST call takes")
+    parser.add_argument('--tracemalloc', action='store_true', help="Also measure Python heap growth (slower)")
+    parser.add_argument('--json', metavar='PATH', help="Write the results to a JSON file")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+def print_results(name: str, results: dict):
+    print(f"\n=== {name} ===")
+    for key, value in results.items():
+        print(f"  {key:<28} {value:.2f}" if isinstance(value, float) else f"  {key:<28} {value}")
+
+async def run(args) -> dict:
+    stubs = StubUpstreams(latency=args.upstream_latency)
+    await stubs.start()
+    point_config_at(stubs)
+    all_results = {}
+    try:
+        for name in args.scenarios:
+            api = FakeDiscord(latency=args.discord_latency)
+            async with BenchBot(api, FakeGeminiModel()) as env:
+                lag_probe = LoopLagProbe()
+                memory_probe = MemoryProbe(args.tracemalloc)
+                memory_probe.start()
+                lag_probe.start()
+                try:
+                    results = await SCENARIOS[name](env, args)
+                finally:
+                    await lag_probe.stop()
+                results.update(lag_probe.summary())
+                results.update(memory_probe.stop())
+            all_results[name] = results
+            print_results(name, results)
+    finally:
+        await stubs.close()
+    all_results['upstream_requests'] = dict(stubs.requests)
+    return all_results
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+    print(f"\nUpstream requests: {results['upstream_requests']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
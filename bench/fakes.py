@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+from collections import Counter
+
+# --- Fake Discord API ---
+
+class FakeDiscord:
+    """
+    Stands in for Discord's REST API. Every send, edit and reply is counted by kind and
+    takes `latency` seconds, roughly what a real REST round trip costs.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._ids = itertools.count(1_000_000)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def call(self, kind: str):
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakeSentMessage:
+    """A message the bot has sent. Only keeps what the bot reads back."""
+    def __init__(self, api: FakeDiscord, channel, content=None, **kwargs):
+        self.api = api
+        self.id = api.next_id()
+        self.channel = channel
+        self.content = content
+        self.embed = kwargs.get('embed')
+        self.view = kwargs.get('view')
+
+    async def edit(self, **kwargs):
+        await self.api.call('edit')
+        self.content = kwargs.get('content', self.content)
+        self.embed = kwargs.get('embed', self.embed)
+        self.view = kwargs.get('view', self.view)
+        return self
+
+    async def delete(self, **kwargs):
+        await self.api.call('delete')
+
+class FakeChannel:
+    def __init__(self, api: FakeDiscord, channel_id: int, guild=None):
+        self.api = api
+        self.id = channel_id
+        self.guild = guild
+
+    async def send(self, content=None, **kwargs):
+        await self.api.call('send')
+        return FakeSentMessage(self.api, self, content, **kwargs)
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+class FakeUser:
+    def __init__(self, api: FakeDiscord, user_id: int, name: str = None, *, bot: bool = False):
+        self.api = api
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.bot = bot
+        self.dm_channel = None
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def mentioned_in(self, message) -> bool:
+        return message.mention_everyone or any(user.id == self.id for user in message.mentions)
+
+    async def send(self, content=None, **kwargs):
+        if self.dm_channel is None:
+            await self.api.call('open_dm')
+            self.dm_channel = FakeChannel(self.api, self.api.next_id())
+        return await self.dm_channel.send(content, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+class FakeMessage:
+    """An incoming guild message, with just the attributes the router and cogs read."""
+    def __init__(self, api: FakeDiscord, content: str, author: FakeUser, channel: FakeChannel, *, mentions=()):
+        self.api = api
+        self.id = api.next_id()
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.mentions = list(mentions)
+        self.mention_everyone = False
+
+    async def reply(self, content=None, **kwargs):
+        await self.api.call('reply')
+        return FakeSentMessage(self.api, self.channel, content, **kwargs)
+
+    async def add_reaction(self, emoji):
+        await self.api.call('reaction')
+
+# --- Fake Interactions ---
+
+class FakeInteractionResponse:
+    def __init__(self, api: FakeDiscord):
+        self.api = api
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, kind: str):
+        if self._done:
+            raise RuntimeError("This interaction has already been responded to")
+        self._done = True
+        await self.api.call(kind)
+
+    async def edit_message(self, **kwargs):
+        await self._respond('interaction_edit')
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond('interaction_send')
+
+    async def defer(self, **kwargs):
+        await self._respond('interaction_defer')
+
+class FakeFollowup:
+    def __init__(self, api: FakeDiscord, channel: FakeChannel):
+        self.api = api
+        self.channel = channel
+
+    async def send(self, content=None, **kwargs):
+        await self.api.call('followup')
+        return FakeSentMessage(self.api, self.channel, content, **kwargs)
+
+class FakeInteraction:
+    """A component click, e.g. a history-graph button."""
+    def __init__(self, api: FakeDiscord, user: FakeUser, channel: FakeChannel, client=None):
+        self.id = api.next_id()
+        self.client = client
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.response = FakeInteractionResponse(api)
+        self.followup = FakeFollowup(api, channel)
+
+# --- Fake Gemini ---
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeStream:
+    def __init__(self, chunks: list, chunk_delay: float):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._chunk_delay)
+            yield FakeChunk(chunk)
+
+class FakeGeminiModel:
+    """Answers every prompt with a fixed text after a first-token delay, split into streamed chunks."""
+    def __init__(self, *, first_token_delay: float = 0.3, chunk_delay: float = 0.05, chunks: int = 8):
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunks = [f"Benchmark answer part {index}. " for index in range(chunks)]
+        self.calls = 0
+
+    async def generate_content_async(self, contents, stream: bool = False):
+        self.calls += 1
+        await asyncio.sleep(self.first_token_delay)
+        if stream:
+            return FakeStream(self.chunks, self.chunk_delay)
+        await asyncio.sleep(self.chunk_delay * len(self.chunks))
+        return FakeChunk("".join(self.chunks))
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+# config exits without a token; the bench never logs in, so any value will do
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'bench')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    # Absolute, because every scenario runs in its own temporary working directory
+    sys.path.insert(0, REPO_ROOT)
+
+from src import config
+from bench.fakes import FakeDiscord, FakeUser, FakeGeminiModel
+from bench.stubs import StubUpstreams
+
+EXTENSIONS = ['src.cogs.general', 'src.cogs.currency', 'src.cogs.horoscope', 'src.cogs.ai_chat']
+BOT_USER_ID = 1
+
+def point_config_at(stubs: StubUpstreams):
+    """
+    Redirects every upstream URL to the stubs. Must run before the cogs are first imported,
+    because their helpers take these settings as default arguments.
+    """
+    if any(name.startswith('src.cogs.') for name in sys.modules):
+        raise RuntimeError("point_config_at must be called before any cog is imported")
+    config.BASE_CURRENCY_API_URL = stubs.latest_url
+    config.HISTORY_CURRENCY_API_URL = stubs.history_url
+    config.HOROSCOPE_API_URL = stubs.horoscope_url
+
+class BenchBot:
+    """
+    A MyBot with all cogs loaded that never connects to Discord.
+    Runs in a fresh temporary working directory, so the SQLite stores start empty and nothing
+    in the repository is touched. Use as `async with BenchBot(...) as env:`.
+    """
+    def __init__(self, api: FakeDiscord, gemini_model: FakeGeminiModel = None):
+        self.api = api
+        self.gemini_model = gemini_model or FakeGeminiModel()
+        self.bot = None
+        self._tmpdir = None
+        self._previous_cwd = None
+
+    async def __aenter__(self):
+        from main import MyBot
+
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='dcjbot-bench-')
+        self._previous_cwd = os.getcwd()
+        os.chdir(self._tmpdir.name)
+
+        self.bot = MyBot()
+        # Initialises the client's loop-bound state without logging in (setup_hook is not run)
+        await self.bot.__aenter__()
+        # discord.py reads the bot's own user from the connection state; there is no READY event here
+        self.bot._connection.user = FakeUser(self.api, BOT_USER_ID, 'BenchBot', bot=True)
+        await self.bot.http_client.start()
+        for extension in EXTENSIONS:
+            await self.bot.load_extension(extension)
+        self.bot.gemini_model = self.gemini_model
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            # Unloads every cog (flushing their stores) and closes the shared HTTP client
+            await self.bot.__aexit__(*exc_info)
+        finally:
+            os.chdir(self._previous_cwd)
+            self._tmpdir.cleanup()
+
+    def cog(self, name: str):
+        return self.bot.get_cog(name)
@@ -0,0 +1,94 @@
+import asyncio
+import resource
+import sys
+import time
+import tracemalloc
+
+# --- Latency ---
+
+class LatencyRecorder:
+    """Collects handler latencies in seconds and summarises them as percentiles."""
+    def __init__(self):
+        self.samples = []
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    async def timed(self, coro):
+        started_at = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.samples.append(time.perf_counter() - started_at)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self) -> dict:
+        return {
+            'count': len(self.samples),
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': max(self.samples, default=0.0) * 1000,
+        }
+
+# --- Event Loop Lag ---
+
+class LoopLagProbe:
+    """
+    Sleeps for `interval` seconds in a loop and records how late each wake-up is.
+    Anything blocking the event loop (sync I/O, heavy CPU) shows up as lag.
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = LatencyRecorder()
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.record(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> dict:
+        summary = self.lags.summary()
+        return {'loop_lag_p50_ms': summary['p50_ms'], 'loop_lag_p99_ms': summary['p99_ms'], 'loop_lag_max_ms': summary['max_ms']}
+
+# --- Memory ---
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class MemoryProbe:
+    """Python heap growth during a scenario, via tracemalloc (slows the run down noticeably)."""
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+
+    def start(self):
+        if self.enabled:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+
+    def stop(self) -> dict:
+        summary = {'peak_rss_mb': peak_rss_mb()}
+        if self.enabled:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            summary['heap_current_mb'] = current / (1024 * 1024)
+            summary['heap_peak_mb'] = peak / (1024 * 1024)
+        return summary
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from src.ratelimit import TokenBucket
+from bench.fakes import FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser
+from bench.harness import BenchBot
+from bench.metrics import LatencyRecorder
+
+# Typical traffic: most messages aren't for the bot at all
+CURRENCY_MESSAGES = [
+    "!usd", "!usd100 myr", "!eur 250 sgd jpy gbp", "!myr usd", "!gbp 3", "!lol", "!test2",
+    "just chatting about lunch", "anyone around?", "did you see the match last night", "ok", "lol",
+]
+GRAPH_PAIRS = [("USD", "MYR"), ("EUR", "USD"), ("GBP", "JPY"), ("SGD", "MYR"), ("USD", "CNY")]
+
+# --- Helpers ---
+
+class Population:
+    """A fixed set of fake guilds, channels and users to spread synthetic traffic over."""
+    def __init__(self, env: BenchBot, *, guilds: int, users: int):
+        self.api = env.api
+        self.guilds = [FakeGuild(env.api.next_id()) for _ in range(guilds)]
+        self.channels = [FakeChannel(env.api, env.api.next_id(), guild) for guild in self.guilds]
+        self.users = [FakeUser(env.api, env.api.next_id()) for _ in range(users)]
+
+    def message(self, index: int, content: str, **kwargs) -> FakeMessage:
+        author = self.users[index % len(self.users)]
+        channel = self.channels[index % len(self.channels)]
+        return FakeMessage(self.api, content, author, channel, **kwargs)
+
+async def run_jobs(jobs, concurrency: int, recorder: LatencyRecorder) -> float:
+    """Awaits every job factory in `jobs` with at most `concurrency` running at once. Returns the elapsed time."""
+    jobs = iter(jobs)
+
+    async def worker():
+        for job in jobs:
+            try:
+                await recorder.timed(job())
+            except Exception as e:
+                print(f"Bench job failed: {e!r}")
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started_at
+
+def throughput(count: int, elapsed: float) -> dict:
+    return {'elapsed_s': elapsed, 'per_second': count / elapsed if elapsed else 0.0}
+
+# --- Scenarios ---
+
+async def currency_burst(env: BenchBot, args) -> dict:
+    """A burst of guild messages through MyBot.on_message: conversions, all-rates tables, typos and chatter."""
+    population = Population(env, guilds=20, users=500)
+    recorder = LatencyRecorder()
+    messages = [population.message(index, CURRENCY_MESSAGES[index % len(CURRENCY_MESSAGES)]) for index in range(args.messages)]
+    jobs = (lambda message=message: env.bot.on_message(message) for message in messages)
+    elapsed = await run_jobs(jobs, args.concurrency, recorder)
+    cog = env.cog('CurrencyCog')
+    return {
+        **throughput(len(messages), elapsed), **recorder.summary(),
+        'discord_calls': sum(env.api.calls.values()), **env.bot.router.stats(),
+        'rate_upstream_fetches': cog.rate_cache.upstream_fetches,
+    }
+
+async def horoscope_broadcast(env: BenchBot, args) -> dict:
+    """The worst delivery minute: one scheduler bucket holding all `--users` registered users, all resolvable from the member cache."""
+    cog = env.cog('HoroscopeCog')
+    signs = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+    users = {}
+    for index in range(args.users):
+        user = FakeUser(env.api, env.api.next_id())
+        users[user.id] = user
+        await cog.user_store.set(str(user.id), signs[index % len(signs)])
+    env.bot.get_user = users.get
+    if args.broadcast_rate:
+        cog.broadcaster.rate_limiter = TokenBucket(rate=args.broadcast_rate, capacity=args.broadcast_rate)
+    else:
+        # Unthrottled, so the run measures the bot's own overhead rather than the configured pacing
+        cog.broadcaster.rate_limiter = TokenBucket(rate=1e9, capacity=1e9)
+
+    started_at = time.perf_counter()
+    await cog.deliver_bucket(sorted(str(user_id) for user_id in users))
+    elapsed = time.perf_counter() - started_at
+    return {
+        **throughput(args.users, elapsed), 'dms_sent': env.api.calls['send'], 'dm_channels_opened': env.api.calls['open_dm'],
+        'horoscope_upstream_fetches': cog.horoscope_cache.upstream_fetches,
+    }
+
+async def graph_click_storm(env: BenchBot, args) -> dict:
+    """Many users clicking history-graph buttons at once, across a handful of pairs and every window."""
+    from src.cogs.currency import build_history_graph_view
+
+    cog = env.cog('CurrencyCog')
+    population = Population(env, guilds=5, users=200)
+    recorder = LatencyRecorder()
+
+    def click(index: int):
+        base, target = GRAPH_PAIRS[index % len(GRAPH_PAIRS)]
+        view = build_history_graph_view(base, target)
+        button = view.children[(index // len(GRAPH_PAIRS)) % len(view.children)]
+        interaction = FakeInteraction(env.api, population.users[index % len(population.users)], population.channels[index % len(population.channels)], client=env.bot)
+        return button.callback(interaction)
+
+    jobs = (lambda index=index: click(index) for index in range(args.clicks))
+    elapsed = await run_jobs(jobs, args.concurrency, recorder)
+    return {
+        **throughput(args.clicks, elapsed), **recorder.summary(), **cog.graph_renderer.stats(),
+        'history_upstream_fetches': cog.rate_history.upstream_fetches, 'graphs_sent': env.api.calls['followup'],
+    }
+
+async def ai_mention_flood(env: BenchBot, args) -> dict:
+    """A flood of mentions from many users; most are turned away by the admission limits, the rest are answered."""
+    cog = env.cog('AIChatCog')
+    population = Population(env, guilds=10, users=args.ai_users)
+    bot_user = env.bot.user
+    recorder = LatencyRecorder()
+    # A small pool of questions, so repeated standalone prompts can be served from the response cache
+    messages = [
+        population.message(index, f"{bot_user.mention} what is fact number {index % 20}?", mentions=[bot_user])
+        for index in range(args.mentions)
+    ]
+    jobs = (lambda message=message: env.bot.on_message(message) for message in messages)
+    elapsed = await run_jobs(jobs, args.concurrency, recorder)
+
+    # Handler latency only covers admission; wait (bounded) for the queue to drain to count answers too
+    drain_started_at = time.perf_counter()
+    while cog.admission.completed < cog.admission.admitted and time.perf_counter() - drain_started_at < args.drain_timeout:
+        await asyncio.sleep(0.05)
+    return {
+        **throughput(len(messages), elapsed), **recorder.summary(),
+        'drain_s': time.perf_counter() - drain_started_at, 'gemini_calls': env.gemini_model.calls,
+        **cog.admission.stats(), **cog.response_cache.stats(),
+    }
+
+SCENARIOS = {
+    'currency': currency_burst,
+    'broadcast': horoscope_broadcast,
+    'graphs': graph_click_storm,
+    'ai': ai_mention_flood,
+}
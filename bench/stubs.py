@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+import random
+from aiohttp import web
+
+# Reference (EUR) rates served by the Frankfurter stub
+REFERENCE_RATES = {
+    "AUD": 1.64, "BGN": 1.96, "BRL": 6.05, "CAD": 1.50, "CHF": 0.94, "CNY": 7.85, "CZK": 25.1, "DKK": 7.46,
+    "GBP": 0.85, "HKD": 8.45, "HUF": 395.0, "IDR": 17600.0, "ILS": 4.05, "INR": 92.5, "ISK": 150.0, "JPY": 162.0,
+    "KRW": 1480.0, "MXN": 20.9, "MYR": 4.85, "NOK": 11.7, "NZD": 1.80, "PHP": 62.5, "PLN": 4.28, "RON": 4.97,
+    "SEK": 11.3, "SGD": 1.45, "THB": 37.5, "TRY": 37.0, "USD": 1.08, "ZAR": 19.8,
+}
+
+def _today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+class StubUpstreams:
+    """
+    Local HTTP server standing in for Frankfurter (latest and time series) and the horoscope API.
+    Each response waits `latency` seconds first. Requests are counted per endpoint.
+    """
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.requests = {'latest': 0, 'history': 0, 'horoscope': 0}
+        self._runner = None
+        self.base_url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/v1/latest', self.latest)
+        app.router.add_get('/v1/{range}', self.history)
+        app.router.add_get('/api/v1/get-horoscope/daily', self.horoscope)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @property
+    def latest_url(self) -> str:
+        return f"{self.base_url}/v1/latest"
+
+    @property
+    def history_url(self) -> str:
+        return f"{self.base_url}/v1/"
+
+    @property
+    def horoscope_url(self) -> str:
+        return f"{self.base_url}/api/v1/get-horoscope/daily"
+
+    async def latest(self, request: web.Request):
+        self.requests['latest'] += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response({'amount': 1.0, 'base': 'EUR', 'date': _today().isoformat(), 'rates': REFERENCE_RATES})
+
+    async def history(self, request: web.Request):
+        self.requests['history'] += 1
+        await asyncio.sleep(self.latency)
+        start, _, end = request.match_info['range'].partition('..')
+        start, end = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+        base = request.query.get('base', 'EUR')
+        symbols = request.query.get('symbols', '').split(',')
+        reference = {'EUR': 1.0, **REFERENCE_RATES}
+        rates, day = {}, start
+        while day <= end:
+            if day.weekday() < 5:
+                # A gentle random walk around today's rate, so graphs have something to draw
+                drift = 1 + random.uniform(-0.02, 0.02)
+                rates[day.isoformat()] = {
+                    symbol: reference[symbol] / reference[base] * drift for symbol in symbols if symbol in reference
+                }
+            day += datetime.timedelta(days=1)
+        return web.json_response({'amount': 1.0, 'base': base, 'start_date': start.isoformat(), 'end_date': end.isoformat(), 'rates': rates})
+
+    async def horoscope(self, request: web.Request):
+        self.requests['horoscope'] += 1
+        await asyncio.sleep(self.latency)
+        sign = request.query.get('sign', '').capitalize()
+        try:
+            day = datetime.date.fromisoformat(request.query.get('day', ''))
+        except ValueError:
+            day = _today()
+        if not sign:
+            return web.json_response({'success': False}, status=404)
+        return web.json_response({
+            'success': True,
+            'data': {'date': day.strftime('%b %d, %Y'), 'horoscope_data': f"A benchmark day for {sign}. " * 10},
+        })
@@ -1,85 +1,197 @@
+import time
+# Taken before the other imports, so their cost shows up in the startup breakdown
+PROCESS_STARTED_AT = time.perf_counter()
+
 import discord
 from discord.ext import commands
 import os
 import asyncio
-import google.generativeai as genai
+import logging
+import signal
+import sys
 
 # Import settings and credentials from our config file
 from src import config
+from src.http_client import HTTPClient
+from src.router import MessageRouter
+from src.instrumentation import LoopLagMonitor, MetricsServer, registry
+from src.log_setup import configure_logging
+from src.launcher import EXIT_FATAL, ShardLauncher
+
+log = logging.getLogger('bot')
+
+# Found relative to this file, so the bot can be started from any working directory
+COGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'cogs')
+
+def load_gemini_model(api_key: str, model_name: str):
+    """Imports the Gemini SDK and creates the model. Slow (mostly the import), so it runs on a worker thread."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
 
 class MyBot(commands.Bot):
-    def __init__(self):
+    def __init__(self, **options):
         super().__init__(
             command_prefix=config.COMMAND_PREFIX,
             intents=config.intents,
             help_command=None, # We use a custom help command in a cog
-            owner_id=config.BOT_OWNER_ID
+            owner_id=config.BOT_OWNER_ID,
+            **options
         )
         self.gemini_model = None
+        self.gemini_loading = None # Background task importing the Gemini SDK during startup
+        # Seconds per startup phase, logged once the bot is ready
+        self.startup_timings = {'imports': time.perf_counter() - PROCESS_STARTED_AT}
+        # Shared pooled HTTP session for every cog's outbound API calls
+        self.http_client = HTTPClient()
+        # Classifies each message once and dispatches it to a command or a cog handler
+        self.router = MessageRouter(self)
+        # Loop lag and per-command/view/task/upstream timings, shown by !stats and on the Prometheus endpoint
+        self.metrics = registry
+        self.loop_lag_monitor = LoopLagMonitor(self.metrics)
+        # Worker processes of a sharded deployment each serve on their own port
+        self.metrics_server = MetricsServer(self.metrics, port=config.METRICS_PORT + config.PROCESS_INDEX) if config.METRICS_PORT else None
+        self.before_invoke(self._start_command_timer)
+        self.after_invoke(self._record_command_time)
 
     async def setup_hook(self):
         """This is called once when the bot logs in."""
-        # --- Load Cogs ---
-        print("Loading cogs...")
-        # The loop will automatically find and load the new general.py cog
-        for filename in os.listdir('./src/cogs'):
-            if filename.endswith('.py') and not filename.startswith('__'):
-                try:
-                    await self.load_extension(f'src.cogs.{filename[:-3]}')
-                    print(f'  - Loaded {filename}')
-                except Exception as e:
-                    print(f'  - Failed to load {filename}: {e}')
-        print("Cogs loaded.")
-
-        # --- Configure Gemini API ---
+        setup_started_at = time.perf_counter()
+        # --- Import the Gemini SDK in the background; it isn't needed until the first mention ---
         if config.GEMINI_API_KEY:
-            try:
-                genai.configure(api_key=config.GEMINI_API_KEY)
-                self.gemini_model = genai.GenerativeModel(config.DEFAULT_GEMINI_MODEL)
-                print(f"Successfully initialized Gemini model: {config.DEFAULT_GEMINI_MODEL}")
-            except Exception as e:
-                print(f"CRITICAL: Failed to initialize Gemini model: {e}")
+            self.gemini_loading = asyncio.create_task(self._load_gemini())
         else:
-            print("Warning: GEMINI_API_KEY not found. AI features are disabled.")
-            
+            log.warning("GEMINI_API_KEY not found. AI features are disabled.")
+
+        # --- Start the shared HTTP client before any cog needs it ---
+        await self.http_client.start()
+        self.loop_lag_monitor.start()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+                log.info("Metrics available at http://%s:%s/metrics", self.metrics_server.host, self.metrics_server.port)
+            except OSError as e:
+                log.warning("Could not start the metrics endpoint: %s", e)
+                self.metrics_server = None
+
+        # --- Load Cogs ---
+        # Cogs don't depend on each other, so they are loaded concurrently; any new file in src/cogs is picked up
+        log.info("Loading cogs...")
+        extensions = sorted(f'src.cogs.{filename[:-3]}' for filename in os.listdir(COGS_DIR)
+                            if filename.endswith('.py') and not filename.startswith('__'))
+        await asyncio.gather(*(self._load_cog(extension) for extension in extensions))
+        log.info("Cogs loaded.")
+        self.startup_timings['setup_hook'] = time.perf_counter() - setup_started_at
+
+    async def _load_cog(self, extension: str):
+        started_at = time.perf_counter()
+        try:
+            await self.load_extension(extension)
+            log.info("Loaded %s", extension)
+        except Exception:
+            log.exception("Failed to load %s", extension)
+        self.startup_timings[f'cog:{extension.rsplit(".", 1)[-1]}'] = time.perf_counter() - started_at
+
+    async def _load_gemini(self):
+        started_at = time.perf_counter()
+        try:
+            self.gemini_model = await asyncio.to_thread(load_gemini_model, config.GEMINI_API_KEY, config.DEFAULT_GEMINI_MODEL)
+            log.info("Successfully initialized Gemini model: %s", config.DEFAULT_GEMINI_MODEL)
+        except Exception as e:
+            log.critical("Failed to initialize Gemini model: %s", e)
+        self.startup_timings['gemini'] = time.perf_counter() - started_at
+
+    async def wait_for_gemini(self):
+        """Waits for the startup import of the Gemini SDK, if it is still running."""
+        if self.gemini_loading and not self.gemini_loading.done():
+            await asyncio.shield(self.gemini_loading)
+
     async def on_ready(self):
         """Event fired when the bot is ready."""
-        print('------')
-        print(f'Bot is ready! Logged in as {self.user.name}')
-        print(f"Command Prefix: '{config.COMMAND_PREFIX}' | Mention: @{self.user.name}")
-        print('------')
+        log.info("Bot is ready! Logged in as %s | Command Prefix: '%s' | Mention: @%s", self.user.name, config.COMMAND_PREFIX, self.user.name)
+        if 'ready' not in self.startup_timings:
+            # on_ready fires again after reconnects; only the first one is part of startup
+            self.startup_timings['ready'] = time.perf_counter() - PROCESS_STARTED_AT
+            breakdown = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.startup_timings.items())
+            log.info("Startup timings: %s", breakdown, extra={'startup_timings': dict(self.startup_timings)})
 
     async def on_message(self, message: discord.Message):
-        # Ignore all messages from the bot itself
-        if message.author == self.user:
-            return
+        # The router replaces process_commands and the per-cog on_message listeners;
+        # DMs are answered with a notice and never reach a command or cog.
+        await self.router.route(message)
+
+    async def _start_command_timer(self, ctx: commands.Context):
+        ctx.started_at = time.perf_counter()
+
+    async def _record_command_time(self, ctx: commands.Context):
+        # After-invoke hooks run even when the command raised
+        if started_at := getattr(ctx, 'started_at', None):
+            self.metrics.observe('command', ctx.command.qualified_name, time.perf_counter() - started_at, ctx.command_failed)
+
+    async def close(self):
+        # Cogs are unloaded first, so nothing uses the session once it is closed.
+        await super().close()
+        await self.http_client.close()
+        await self.loop_lag_monitor.stop()
+        if self.gemini_loading:
+            self.gemini_loading.cancel()
+        if self.metrics_server:
+            await self.metrics_server.close()
 
-        # --- FIX: Explicitly handle and block all DMs ---
-        # If the message is a DM, send a reply and stop all further processing.
-        if isinstance(message.channel, discord.DMChannel):
-            try:
-                await message.channel.send("Sorry, I only operate in server channels. Please interact with me there!")
-            except discord.errors.Forbidden:
-                # This can happen if the user has DMs disabled for non-friends.
-                print(f"Could not send DM reply to {message.author.name}")
-            return # Stop any other on_message events or commands from running.
-            
-        # If not a DM, process commands as usual.
-        # The other on_message listeners in the cogs will still run.
-        await self.process_commands(message)
-        
     # The help command has been moved to src/cogs/general.py
 
 
-async def main():
-    bot = MyBot()
+class MyShardedBot(MyBot, commands.AutoShardedBot):
+    """
+    The same bot on several gateway connections. With SHARD_IDS set it only runs those shards,
+    as one worker process of a multi-process deployment.
+    """
+    async def on_shard_ready(self, shard_id: int):
+        log.info("Shard %d is ready", shard_id)
+
+def create_bot() -> MyBot:
+    if not config.SHARDED:
+        return MyBot()
+    # shard_count=None asks Discord for the recommended count
+    return MyShardedBot(shard_count=config.SHARD_COUNT, shard_ids=config.SHARD_IDS)
+
+async def main() -> int:
+    """Runs the bot until it is closed. Returns the process exit code."""
+    bot = create_bot()
     try:
-        await bot.start(config.DISCORD_BOT_TOKEN)
+        # 'async with' closes the bot on any exit, which unloads the cogs and flushes their pending writes.
+        async with bot:
+            await bot.start(config.DISCORD_BOT_TOKEN)
     except discord.LoginFailure:
-        print("FATAL ERROR: Invalid Discord bot token. Please check your .env file.")
-    except Exception as e:
-        print(f"An unexpected error occurred while starting the bot: {e}")
+        log.critical("Invalid Discord bot token. Please check your .env file.")
+        return EXIT_FATAL
+    except discord.PrivilegedIntentsRequired:
+        log.critical("The bot's privileged intents are not enabled in the Discord developer portal.")
+        return EXIT_FATAL
+    except Exception:
+        log.exception("An unexpected error occurred while starting the bot")
+        return 1
+    return 0
+
+def stop_on_sigterm(signum, frame):
+    # Raised inside asyncio.run, which cancels main() so the bot closes cleanly and flushes its stores
+    raise KeyboardInterrupt
 
 if __name__ == '__main__':
-    # Using asyncio.run() is the modern way to start an async program.
-    asyncio.run(main())
+    # Logs are formatted and written by a background thread; stopping the listener flushes the rest.
+    log_listener = configure_logging()
+    exit_code = 0
+    try:
+        if config.SHARD_PROCESSES > 1 and config.SHARD_IDS is None:
+            # This process only supervises; each worker re-runs this file with its own shard range
+            exit_code = ShardLauncher(os.path.abspath(__file__)).run()
+        else:
+            signal.signal(signal.SIGTERM, stop_on_sigterm)
+            # Using asyncio.run() is the modern way to start an async program.
+            exit_code = asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_listener.stop()
+    # Non-zero tells the launcher (or a service manager) not to treat this as a clean stop
+    sys.exit(exit_code)
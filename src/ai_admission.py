@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+# Import config variables
+from src import config
+from src.ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+# Reasons a prompt can be turned away by `AdmissionQueue.submit`
+REJECTED_USER = 'user'
+REJECTED_GUILD = 'guild'
+REJECTED_QUEUE_FULL = 'queue_full'
+
+class AdmissionQueue:
+    """
+    Admission layer for AI prompts.
+    Each prompt must pass a per-user and a per-guild token bucket, then waits in a bounded FIFO queue.
+    A fixed pool of workers serves the queue, and each worker takes a token from a global bucket
+    matched to the Gemini quota before it calls `handler(*item)`.
+    """
+    def __init__(self, handler, *, workers: int = config.AI_WORKERS, max_queue: int = config.AI_MAX_QUEUE,
+                 user_rate: float = config.AI_USER_RATE, user_burst: float = config.AI_USER_BURST,
+                 guild_rate: float = config.AI_GUILD_RATE, guild_burst: float = config.AI_GUILD_BURST,
+                 global_rate: float = config.AI_GLOBAL_RATE, global_burst: float = config.AI_GLOBAL_BURST):
+        self.handler = handler
+        self.workers = workers
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.guild_rate, self.guild_burst = guild_rate, guild_burst
+        # The Gemini quota is per API key, so worker processes of a sharded deployment each take an equal share
+        processes = config.SHARD_PROCESSES
+        self.global_bucket = TokenBucket(rate=global_rate / processes, capacity=max(1, global_burst / processes))
+        self._user_buckets = {}
+        self._guild_buckets = {}
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._worker_tasks = []
+        # --- Metrics ---
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = {REJECTED_USER: 0, REJECTED_GUILD: 0, REJECTED_QUEUE_FULL: 0}
+        self.in_flight = 0
+        self.max_depth = 0
+        self._wait_times = deque(maxlen=1000) # Seconds spent queued, most recent prompts
+
+    def start(self):
+        for index in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(), name=f'ai-worker-{index}'))
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def _bucket(self, buckets: dict, key, rate: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= config.AI_MAX_TRACKED_BUCKETS:
+                # Full buckets carry no state, so they can be dropped to keep memory bounded
+                for stale_key in [k for k, b in buckets.items() if b.is_full]:
+                    del buckets[stale_key]
+            bucket = buckets[key] = TokenBucket(rate=rate, capacity=burst)
+        return bucket
+
+    def submit(self, user_id: int, guild_id: int, *item) -> str:
+        """
+        Tries to queue a prompt. Returns None when it was admitted,
+        otherwise the reason it was rejected (REJECTED_USER, REJECTED_GUILD or REJECTED_QUEUE_FULL).
+        """
+        user_bucket = self._bucket(self._user_buckets, user_id, self.user_rate, self.user_burst)
+        guild_bucket = self._bucket(self._guild_buckets, guild_id, self.guild_rate, self.guild_burst)
+        if user_bucket.time_until() > 0:
+            self.rejected[REJECTED_USER] += 1
+            return REJECTED_USER
+        if guild_bucket.time_until() > 0:
+            self.rejected[REJECTED_GUILD] += 1
+            return REJECTED_GUILD
+        try:
+            self._queue.put_nowait((time.perf_counter(), item))
+        except asyncio.QueueFull:
+            self.rejected[REJECTED_QUEUE_FULL] += 1
+            return REJECTED_QUEUE_FULL
+        # Only charge the buckets once the prompt is actually accepted
+        user_bucket.try_acquire()
+        guild_bucket.try_acquire()
+        self.admitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return None
+
+    async def _worker(self):
+        while True:
+            enqueued_at, item = await self._queue.get()
+            try:
+                await self.global_bucket.acquire()
+                self._wait_times.append(time.perf_counter() - enqueued_at)
+                self.in_flight += 1
+                try:
+                    await self.handler(*item)
+                finally:
+                    self.in_flight -= 1
+            except Exception:
+                log.exception("AI worker failed to handle a prompt")
+            finally:
+                self.completed += 1
+                self._queue.task_done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+        def percentile(fraction):
+            return waits[min(len(waits) - 1, int(len(waits) * fraction))] if waits else 0.0
+        return {
+            'queue_depth': self.depth,
+            'max_queue_depth': self.max_depth,
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'completed': self.completed,
+            'rejected_user': self.rejected[REJECTED_USER],
+            'rejected_guild': self.rejected[REJECTED_GUILD],
+            'rejected_queue_full': self.rejected[REJECTED_QUEUE_FULL],
+            'wait_p50': percentile(0.5),
+            'wait_p99': percentile(0.99),
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+import re
+import time
+from collections import OrderedDict
+
+# Import config variables
+from src import config
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation, so trivially different prompts match."""
+    return _TRAILING_PUNCTUATION.sub('', _WHITESPACE.sub(' ', prompt.strip().lower()))
+
+def _similarity(words_a: frozenset, words_b: frozenset) -> float:
+    """Jaccard similarity of two word sets."""
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+class CacheEntry:
+    def __init__(self, text: str, latency: float):
+        self.text = text
+        self.latency = latency # How long the original answer took to generate
+        self.created_at = time.monotonic()
+        self.size = len(text.encode('utf-8'))
+
+class ResponseCache:
+    """
+    Cache of AI answers keyed by normalized prompt, with TTL and LRU eviction under a byte cap.
+    An optional similarity tier also matches prompts whose word sets are nearly identical.
+    Concurrent identical prompts share a single in-flight generation.
+    """
+    def __init__(self, *, ttl: float = config.AI_CACHE_TTL, max_bytes: int = config.AI_CACHE_MAX_BYTES,
+                 similarity_threshold: float = config.AI_CACHE_SIMILARITY_THRESHOLD,
+                 similarity_scan: int = config.AI_CACHE_SIMILARITY_SCAN):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self.similarity_scan = similarity_scan
+        self._entries = OrderedDict() # normalized prompt -> CacheEntry, least recently used first
+        self._words = {} # normalized prompt -> frozenset of words, for the similarity tier
+        self._inflight = {} # normalized prompt -> Future of an answer being generated
+        self.bytes = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.deduplicated = 0
+        self.misses = 0
+        self.saved_latency = 0.0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._words.pop(key, None)
+        self.bytes -= entry.size
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() - entry.created_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry
+
+        if not self.similarity_threshold:
+            return None
+        words = frozenset(key.split())
+        # Only the most recently used entries are compared, which keeps the scan bounded
+        for candidate in list(itertools.islice(reversed(self._entries), self.similarity_scan)):
+            if _similarity(words, self._words[candidate]) >= self.similarity_threshold:
+                entry = self._entries[candidate]
+                if time.monotonic() - entry.created_at > self.ttl:
+                    continue
+                self._entries.move_to_end(candidate)
+                self.similar_hits += 1
+                return entry
+        return None
+
+    def _store(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._words[key] = frozenset(key.split())
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def get_or_generate(self, prompt: str, generate):
+        """
+        Returns (answer, cached). `generate` is an async callable producing the answer on a miss;
+        `cached` is True when the answer came from the cache or from another caller's in-flight request.
+        """
+        key = normalize_prompt(prompt)
+        if (entry := self._lookup(key)) is not None:
+            self.saved_latency += entry.latency
+            return entry.text, True
+        if (inflight := self._inflight.get(key)) is not None:
+            self.deduplicated += 1
+            text, latency = await asyncio.shield(inflight)
+            self.saved_latency += latency
+            return text, True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        started_at = time.perf_counter()
+        try:
+            text = await generate()
+            latency = time.perf_counter() - started_at
+            future.set_result((text, latency))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Mark as retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+        if text:
+            self._store(key, CacheEntry(text, latency))
+        return text, False
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits + self.deduplicated
+        lookups = hits + self.misses
+        return {
+            'cache_hit_ratio': hits / lookups if lookups else 0.0,
+            'cache_exact_hits': self.exact_hits,
+            'cache_similar_hits': self.similar_hits,
+            'cache_deduplicated': self.deduplicated,
+            'cache_misses': self.misses,
+            'cache_saved_seconds': self.saved_latency,
+            'cache_entries': len(self._entries),
+            'cache_bytes': self.bytes,
+        }
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+
+# Import config variables
+from src import config
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting without an API call."""
+    return max(1, len(text) // 4)
+
+class ChatSession:
+    """The recent conversation in one channel or thread, kept within a token budget."""
+    def __init__(self, key: int):
+        self.key = key
+        self.turns = [] # [(role, text)], oldest first
+        self.tokens = 0
+        self.chars = 0
+        self.last_used = time.monotonic()
+
+    def contents(self, prompt: str, token_budget: int) -> list:
+        """
+        Builds the Gemini `contents` for a new prompt: as much recent history as fits the budget,
+        followed by the prompt itself.
+        """
+        remaining = token_budget - estimate_tokens(prompt)
+        history = []
+        # Walk back from the newest exchange, keeping whole user/model pairs
+        for index in range(len(self.turns) - 2, -1, -2):
+            pair = self.turns[index:index + 2]
+            cost = sum(estimate_tokens(text) for _, text in pair)
+            if cost > remaining:
+                break
+            remaining -= cost
+            history[:0] = pair
+        return [{'role': role, 'parts': [text]} for role, text in history] + [{'role': 'user', 'parts': [prompt]}]
+
+    def record(self, prompt: str, answer: str, token_budget: int):
+        """Adds an exchange and drops the oldest ones until the history fits the budget again."""
+        for role, text in (('user', prompt), ('model', answer)):
+            self.turns.append((role, text))
+            self.tokens += estimate_tokens(text)
+            self.chars += len(text)
+        while self.tokens > token_budget and len(self.turns) > 2:
+            for role, text in self.turns[:2]:
+                self.tokens -= estimate_tokens(text)
+                self.chars -= len(text)
+            del self.turns[:2]
+
+class SessionStore:
+    """
+    Per-channel chat sessions with an LRU cap on how many are kept and idle-time eviction,
+    so memory stays bounded no matter how many guilds the bot is in.
+    """
+    def __init__(self, max_sessions: int = config.AI_MAX_SESSIONS, idle_timeout: float = config.AI_SESSION_IDLE_TIMEOUT,
+                 token_budget: int = config.AI_CONTEXT_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.token_budget = token_budget
+        self._sessions = OrderedDict() # key -> ChatSession, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_idle += 1
+
+    def get(self, key: int) -> ChatSession:
+        """Returns the session for a channel, creating it (and evicting old ones) if needed."""
+        self._evict_idle()
+        session = self._sessions.get(key)
+        if session is None:
+            self.misses += 1
+            session = self._sessions[key] = ChatSession(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted_lru += 1
+        else:
+            self.hits += 1
+            self._sessions.move_to_end(key)
+        session.last_used = time.monotonic()
+        return session
+
+    def reset(self, key: int) -> bool:
+        return self._sessions.pop(key, None) is not None
+
+    def stats(self) -> dict:
+        self._evict_idle()
+        lookups = self.hits + self.misses
+        return {
+            'sessions': len(self._sessions),
+            'session_hit_ratio': self.hits / lookups if lookups else 0.0,
+            'sessions_evicted_idle': self.evicted_idle,
+            'sessions_evicted_lru': self.evicted_lru,
+            'session_tokens': sum(session.tokens for session in self._sessions.values()),
+            'session_chars': sum(session.chars for session in self._sessions.values()),
+        }
@@ -0,0 +1,77 @@
+import time
+import discord
+
+# Import config variables
+from src import config
+
+MESSAGE_LIMIT = 2000 # Discord's hard limit per message
+PLACEHOLDER = "💭 Thinking..."
+
+def split_pages(text: str, limit: int = MESSAGE_LIMIT) -> list:
+    """
+    Splits text into pages of at most `limit` characters, preferring to break at a newline or space.
+    Appending more text never moves an earlier break, so finished pages don't change while streaming.
+    """
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(' ', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut])
+        text = text[cut:].lstrip('\n ')
+    pages.append(text)
+    return pages
+
+class StreamingReply:
+    """
+    A reply that is posted right away and then edited in place as text arrives.
+    Edits are throttled to one per `edit_interval` seconds, and the text rolls over into
+    follow-up messages whenever it passes Discord's 2000-character limit.
+    """
+    def __init__(self, message: discord.Message, *, edit_interval: float = config.AI_STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.text = ""
+        self._sent = [] # (discord.Message, content currently shown)
+        self._last_sync = 0.0
+
+    @property
+    def has_text(self) -> bool:
+        return bool(self.text.strip())
+
+    async def start(self):
+        """Posts the placeholder reply."""
+        reply = await self.message.reply(PLACEHOLDER)
+        self._sent.append((reply, PLACEHOLDER))
+        self._last_sync = time.monotonic()
+
+    async def append(self, text: str):
+        self.text += text
+        if time.monotonic() - self._last_sync >= self.edit_interval:
+            await self._sync()
+
+    async def finish(self, fallback: str = None):
+        """Shows the complete text (or `fallback` when nothing arrived)."""
+        if not self.has_text and fallback:
+            self.text = fallback
+        await self._sync()
+
+    async def _sync(self):
+        self._last_sync = time.monotonic()
+        if not self.has_text:
+            return
+        for index, page in enumerate(split_pages(self.text)):
+            if index < len(self._sent):
+                sent_message, shown = self._sent[index]
+                if page != shown:
+                    await sent_message.edit(content=page)
+                    self._sent[index] = (sent_message, page)
+            elif index == 0:
+                sent_message = await self.message.reply(page)
+                self._sent.append((sent_message, page))
+            else:
+                # Rolled over the limit: continue in a new message
+                sent_message = await self.message.channel.send(page)
+                self._sent.append((sent_message, page))
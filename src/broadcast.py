@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+import discord
+from discord.ext import commands
+
+# Import config variables
+from src import config
+from src.ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+# Per-recipient lines, sampled through config.LOG_SAMPLING
+delivery_log = logging.getLogger(__name__ + '.delivery')
+
+class Broadcaster:
+    """
+    Delivers one DM per recipient with a bounded pool of concurrent workers.
+    Every Discord REST call first takes a token from a shared bucket kept below the global rate limit;
+    discord.py's own per-route buckets still handle any 429s on top of that.
+    """
+    def __init__(self, bot: commands.Bot, *, workers: int = config.BROADCAST_WORKERS,
+                 rate: float = config.BROADCAST_RATE_PER_SECOND, progress_every: int = config.BROADCAST_PROGRESS_EVERY):
+        self.bot = bot
+        self.workers = workers
+        self.rate_limiter = TokenBucket(rate=rate, capacity=rate)
+        self.progress_every = progress_every
+
+    async def _resolve_user(self, user_id: int, stats: dict):
+        """Uses the member cache first and only falls back to a REST lookup when the user isn't cached."""
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            stats['cache_hits'] += 1
+            return user
+        await self.rate_limiter.acquire()
+        stats['fetched'] += 1
+        return await self.bot.fetch_user(user_id)
+
+    async def _worker(self, queue: asyncio.Queue, send, stats: dict, started_at: float):
+        while True:
+            try:
+                user_id, payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                user = await self._resolve_user(int(user_id), stats)
+                # Opening the DM channel is a REST call of its own the first time
+                await self.rate_limiter.acquire(1 if user.dm_channel else 2)
+                await send(user, payload)
+                stats['sent'] += 1
+            except (discord.NotFound, discord.Forbidden) as e:
+                stats['unreachable'] += 1
+                delivery_log.info("Cannot send broadcast to user: %s", e, extra={'user_id': user_id})
+            except Exception as e:
+                stats['failed'] += 1
+                delivery_log.warning("An error occurred processing user: %s", e, extra={'user_id': user_id})
+            finally:
+                done = stats['sent'] + stats['unreachable'] + stats['failed']
+                if self.progress_every and done % self.progress_every == 0:
+                    elapsed = time.perf_counter() - started_at
+                    log.info("Broadcast progress: %d/%d (%.1f/s)", done, stats['total'], done / elapsed)
+
+    async def run(self, recipients: dict, send) -> dict:
+        """
+        Calls `await send(user, payload)` for every {user_id: payload} item and returns the run statistics.
+        """
+        queue = asyncio.Queue()
+        for user_id, payload in recipients.items():
+            queue.put_nowait((user_id, payload))
+
+        stats = {'total': len(recipients), 'sent': 0, 'unreachable': 0, 'failed': 0, 'cache_hits': 0, 'fetched': 0}
+        started_at = time.perf_counter()
+        worker_count = min(self.workers, len(recipients))
+        await asyncio.gather(*(self._worker(queue, send, stats, started_at) for _ in range(worker_count)))
+
+        stats['elapsed'] = time.perf_counter() - started_at
+        stats['per_second'] = stats['total'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        log.info(
+            "Broadcast finished: %d sent, %d unreachable, %d failed of %d in %.1fs (%.1f/s, %d cached users, %d fetched)",
+            stats['sent'], stats['unreachable'], stats['failed'], stats['total'], stats['elapsed'], stats['per_second'],
+            stats['cache_hits'], stats['fetched'], extra={'stats': stats},
+        )
+        return stats
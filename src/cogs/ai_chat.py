@@ -1,26 +1,39 @@
+import logging
 import discord
 from discord.ext import commands
-import time
-import asyncio
 
-# Import config variables and the Gemini model from the bot instance
-from src.config import MIN_GEMINI_DELAY
+# Import config variables; the Gemini model itself lives on the bot instance
+from src.config import AI_STREAMING
+from src.ai_admission import AdmissionQueue, REJECTED_USER, REJECTED_GUILD
+from src.ai_stream import StreamingReply
+from src.ai_sessions import SessionStore
+from src.ai_response_cache import ResponseCache
+from src.instrumentation import timed
+
+log = logging.getLogger(__name__)
 
 class AIChatCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.last_gemini_call_time = 0
+        # Prompts are rate limited per user and per guild, queued, and answered by a fixed pool of workers
+        self.admission = AdmissionQueue(self.answer_prompt)
+        # Recent conversation per channel/thread, so follow-up questions have context
+        self.sessions = SessionStore()
+        # Answers to repeated standalone questions, shared across channels
+        self.response_cache = ResponseCache()
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        # --- FIX: Explicitly ignore all messages in DMs ---
-        if isinstance(message.channel, discord.DMChannel):
-            return
+    async def cog_load(self):
+        self.admission.start()
+        self.bot.router.mention_handler = self.handle_mention
 
-        # Ignore messages from the bot itself or if it's not a mention
-        if message.author == self.bot.user or not self.bot.user.mentioned_in(message):
-            return
-        
+    async def cog_unload(self):
+        self.bot.router.mention_handler = None
+        await self.admission.stop()
+
+    async def handle_mention(self, message: discord.Message):
+        """Answers a guild message that mentions the bot. Called by the message router, which has already dropped DMs and bots."""
+        # The Gemini SDK is imported in the background at startup; a mention that early waits for it
+        await self.bot.wait_for_gemini()
         # Check if the AI model is available (it's attached to the bot instance in run.py)
         if not hasattr(self.bot, 'gemini_model') or self.bot.gemini_model is None:
             await message.reply("My AI brain is currently offline. Please try again later.")
@@ -31,35 +44,72 @@ class AIChatCog(commands.Cog):
             await message.reply("Hello! Mention me with a question to get an AI response.")
             return
 
-        # Rate limiting
-        current_time = time.time()
-        if current_time - self.last_gemini_call_time < MIN_GEMINI_DELAY:
-            remaining = MIN_GEMINI_DELAY - (current_time - self.last_gemini_call_time)
-            await message.reply(f"I'm thinking... please wait {remaining:.1f}s before asking again.", delete_after=5)
-            return
+        # Rate limiting and queueing
+        guild_id = message.guild.id if message.guild else None
+        rejected = self.admission.submit(message.author.id, guild_id, message, user_message)
+        if rejected == REJECTED_USER:
+            await message.reply("You're asking a bit too fast! Please wait a moment before asking again.", delete_after=5)
+        elif rejected == REJECTED_GUILD:
+            await message.reply("This server is keeping me very busy right now. Please try again in a moment.", delete_after=5)
+        elif rejected:
+            await message.reply("I'm handling too many questions right now. Please try again shortly.", delete_after=5)
 
+    @timed('task', 'ai_prompt')
+    async def answer_prompt(self, message: discord.Message, user_message: str):
+        """Sends one queued prompt to Gemini and streams the answer into a reply. Runs on an admission worker."""
+        reply = StreamingReply(message)
         try:
-            async with message.channel.typing():
-                print(f"Sending prompt to Gemini from {message.author}: '{user_message}'")
-                
-                # Access the model from the bot instance
-                response = await self.bot.gemini_model.generate_content_async(user_message)
-                ai_response_text = response.text
-                self.last_gemini_call_time = time.time()
+            # Post the reply straight away, then edit it as tokens arrive
+            await reply.start()
+            # The prompt itself is only logged at DEBUG
+            log.debug("Sending prompt to Gemini: %s", user_message, extra={'user_id': message.author.id, 'channel_id': message.channel.id})
+            session = self.sessions.get(message.channel.id)
 
-                # Handle long messages
-                if len(ai_response_text) > 2000:
-                    chunks = [ai_response_text[i:i + 1990] for i in range(0, len(ai_response_text), 1990)]
-                    for i, chunk in enumerate(chunks):
-                        if i == 0: await message.reply(chunk)
-                        else: await message.channel.send(chunk)
-                        await asyncio.sleep(1)
+            async def generate():
+                contents = session.contents(user_message, self.sessions.token_budget)
+                # Access the model from the bot instance
+                if AI_STREAMING:
+                    response = await self.bot.gemini_model.generate_content_async(contents, stream=True)
+                    async for chunk in response:
+                        await reply.append(chunk.text)
                 else:
-                    await message.reply(ai_response_text)
+                    response = await self.bot.gemini_model.generate_content_async(contents)
+                    await reply.append(response.text)
+                return reply.text
+
+            if session.turns:
+                # Follow-ups depend on the conversation so far, so only standalone prompts are cached
+                await generate()
+            else:
+                answer, cached = await self.response_cache.get_or_generate(user_message, generate)
+                if cached:
+                    await reply.append(answer)
+            if reply.has_text:
+                session.record(user_message, reply.text, self.sessions.token_budget)
+            await reply.finish(fallback="I couldn't come up with an answer to that.")
+
+        except Exception:
+            log.exception("Error processing Gemini prompt", extra={'user_id': message.author.id})
+            error_text = "I'm sorry, I encountered an error while trying to think."
+            if reply.has_text:
+                await message.channel.send(error_text)
+            else:
+                await reply.finish(fallback=error_text)
+
+    @commands.command(name='forget', help="Clear the AI's memory of the conversation in this channel.")
+    async def forget(self, ctx: commands.Context):
+        if self.sessions.reset(ctx.channel.id):
+            await ctx.send("🧹 Done! I've forgotten our conversation in this channel.")
+        else:
+            await ctx.send("There's no conversation to forget in this channel.")
 
-        except Exception as e:
-            print(f"Error processing Gemini prompt: {e}")
-            await message.reply("I'm sorry, I encountered an error while trying to think.")
+    @commands.command(name='aistats', hidden=True)
+    @commands.is_owner()
+    async def ai_stats(self, ctx: commands.Context):
+        """Shows AI queue depth, wait times and rejection counters."""
+        stats = {**self.admission.stats(), **self.sessions.stats(), **self.response_cache.stats()}
+        lines = [f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}" for key, value in stats.items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(AIChatCog(bot))
@@ -1,171 +1,284 @@
 import discord
 from discord.ext import commands
 from discord import ui
-import requests
-import json
-import re
 import asyncio
 import io
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import logging
+import time
 
 # Import config variables
-from src.config import COMMAND_PREFIX, BASE_CURRENCY_API_URL, HISTORY_CURRENCY_API_URL
+from src.config import (COMMAND_PREFIX, HISTORY_WINDOWS, RATE_REFERENCE_BASE, RATE_TABLE_PAGE_SIZE, RATE_TABLE_COLUMNS,
+                        RATE_PREFETCH_DELAY, RATE_CACHE_RETRY_TTL)
+from src.http_client import HTTPError
+from src.rate_cache import RateCache
+from src.graph_renderer import GraphRenderer
+from src.rate_history import RateHistoryStore
+from src.currency_grammar import CurrencyIndex, parse_conversion
+from src.instrumentation import timed
+
+log = logging.getLogger(__name__)
 
 # --- Helper Functions for Currency ---
 
-def generate_history_graph(dates: list, rates: list, base_currency: str, target_currency: str, num_days: int):
-    """Uses Matplotlib to generate a currency history graph."""
-    plt.style.use('dark_background')
-    fig, ax = plt.subplots()
-    ax.set_title(f"{num_days}-Day History: {base_currency} to {target_currency}", color='white')
-    ax.plot(dates, rates, marker='o', linestyle='-', color='cyan')
-    ax.set_xlabel("Date", color='white')
-    ax.set_ylabel(f"Rate (1 {base_currency} = X {target_currency})", color='white')
-    ax.tick_params(axis='x', colors='white', rotation=45)
-    ax.tick_params(axis='y', colors='white')
-    ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='#444444')
-    fig.tight_layout()
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+def build_rate_table_pages(rates: dict, amount: float, page_size: int = RATE_TABLE_PAGE_SIZE) -> list:
+    """Splits a rate table into pages of aligned "CODE  value" lines, sorted by code."""
+    lines = [f"{code} {rate * amount:>14,.4f}" for code, rate in sorted(rates.items())]
+    return [lines[start:start + page_size] for start in range(0, len(lines), page_size)] or [[]]
+
+def build_rate_table_embed(base: str, date: str, amount: float, page: list, page_number: int, page_count: int,
+                           columns: int = RATE_TABLE_COLUMNS) -> discord.Embed:
+    """Lays out one page of rates as side-by-side code blocks in a single embed."""
+    embed = discord.Embed(title=f"Exchange Rates for {amount:,.2f} {base}", color=discord.Color.green())
+    per_column = -(-len(page) // columns) or 1
+    for start in range(0, len(page), per_column):
+        embed.add_field(name="\u200b", value="```\n" + "\n".join(page[start:start + per_column]) + "\n```", inline=True)
+    footer = f"As of {date}"
+    if page_count > 1:
+        footer += f" • Page {page_number + 1}/{page_count}"
+    embed.set_footer(text=footer)
+    return embed
 
 # --- UI Components for Currency ---
+# Buttons carry everything they need in their custom_id and are dispatched by the bot's dynamic item
+# handlers, so no view object is kept per message and old buttons still work after a restart.
 
-class HistoricalGraphView(ui.View):
-    """A View that holds the button to generate a historical graph."""
-    def __init__(self, base_currency: str, target_currency: str, *, timeout=180):
-        super().__init__(timeout=timeout)
-        self.base_currency = base_currency
-        self.target_currency = target_currency
-
-    @ui.button(label="Show History", style=discord.ButtonStyle.primary, emoji="📈")
-    async def show_graph(self, interaction: discord.Interaction, button: ui.Button):
-        button.disabled = True
-        button.label = "Generating Graph..."
-        await interaction.response.edit_message(view=self)
-        api_url = f"{HISTORY_CURRENCY_API_URL}?base={self.base_currency}&symbols={self.target_currency}"
-        try:
-            response = requests.get(api_url)
-            response.raise_for_status()
-            data = response.json()
-            rates_over_time = data.get('rates', {})
-            if not rates_over_time:
-                await interaction.followup.send("Sorry, no historical data found.", ephemeral=True)
-                return
+def build_static_view(*items: ui.Item) -> ui.View:
+    """A view used only to lay out components; it is stopped so discord.py doesn't store it."""
+    view = ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
 
-            sorted_dates = sorted(rates_over_time.keys())
-            rates_for_target = [rates_over_time[date][self.target_currency] for date in sorted_dates]
-            
-            loop = asyncio.get_running_loop()
-            graph_buffer = await loop.run_in_executor(None, generate_history_graph, sorted_dates, rates_for_target, self.base_currency, self.target_currency, len(sorted_dates))
-            
-            graph_file = discord.File(graph_buffer, filename=f"{self.base_currency}-{self.target_currency}_history.png")
-            await interaction.followup.send(file=graph_file)
-        except Exception as e:
-            print(f"Error generating currency graph: {e}")
-            await interaction.followup.send("Sorry, an error occurred while creating the graph.", ephemeral=True)
+class RatePageButton(ui.DynamicItem[ui.Button], template=r'currency:rates:(?P<base>[A-Z]{3}):(?P<amount>[^:]+):(?P<page>\d+)'):
+    """Previous/next button for an all-rates table that doesn't fit on one page."""
+    def __init__(self, base: str, amount: float, page_number: int, *, label: str = "Next", emoji: str = "▶️", disabled: bool = False):
+        super().__init__(ui.Button(
+            label=label, style=discord.ButtonStyle.secondary, emoji=emoji, disabled=disabled,
+            custom_id=f"currency:rates:{base}:{amount!r}:{page_number}",
+        ))
+        self.base = base
+        self.amount = amount
+        self.page_number = page_number
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['base'], float(match['amount']), int(match['page']))
+
+    @timed('view', 'rate_table_page')
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog('CurrencyCog')
+        rates_data = await cog.fetch_exchange_rates(self.base)
+        if not rates_data or 'rates' not in rates_data:
+            await interaction.response.send_message(f"Sorry, I couldn't fetch exchange rates for `{self.base}`.", ephemeral=True)
+            return
+        pages = build_rate_table_pages(rates_data['rates'], self.amount)
+        page_number = min(self.page_number, len(pages) - 1)
+        embed = build_rate_table_embed(self.base, rates_data.get('date'), self.amount, pages[page_number], page_number, len(pages))
+        await interaction.response.edit_message(embed=embed, view=build_rate_table_view(self.base, self.amount, page_number, len(pages)))
+
+def build_rate_table_view(base: str, amount: float, page_number: int, page_count: int) -> ui.View:
+    # The two buttons always point at different pages, so their custom_ids never collide
+    return build_static_view(
+        RatePageButton(base, amount, max(page_number - 1, 0), label="Previous", emoji="◀️", disabled=page_number == 0),
+        RatePageButton(base, amount, min(page_number + 1, page_count - 1), disabled=page_number >= page_count - 1),
+    )
+
+class HistoryGraphButton(ui.DynamicItem[ui.Button], template=r'currency:graph:(?P<base>[A-Z]{3}):(?P<target>[A-Z]{3}):(?P<days>\d+)'):
+    """A button that draws the history graph of one pair for one time window."""
+    def __init__(self, base: str, target: str, num_days: int, *, label: str = None, style: discord.ButtonStyle = discord.ButtonStyle.secondary):
+        super().__init__(ui.Button(label=label or f"{num_days}D", style=style, emoji="📈", custom_id=f"currency:graph:{base}:{target}:{num_days}"))
+        self.base_currency = base
+        self.target_currency = target
+        self.num_days = num_days
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(match['base'], match['target'], int(match['days']), label=item.label, style=item.style)
+
+    @timed('view', 'history_graph')
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog('CurrencyCog')
+        await cog.send_history_graph(interaction, self.base_currency, self.target_currency, self.num_days, self.item.label)
+
+def build_history_graph_view(base: str, target: str) -> ui.View:
+    return build_static_view(*(
+        HistoryGraphButton(base, target, num_days, label=label,
+                           style=discord.ButtonStyle.primary if index == 0 else discord.ButtonStyle.secondary)
+        for index, (label, num_days) in enumerate(HISTORY_WINDOWS.items())
+    ))
 
 # --- Main Cog Class ---
 
 class CurrencyCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # Every base is served from one cached reference table per publication date
+        self.rate_cache = RateCache(bot.http_client)
+        self.graph_renderer = GraphRenderer()
+        self.rate_history = RateHistoryStore(bot.http_client)
+        # Valid codes and aliases, so non-currency words are rejected without any I/O
+        self.currency_index = CurrencyIndex()
+        self._warm_up_task = None
+        self._index_task = None
+        self._prefetch_task = None
+        # Time from the user's message to our reply, for comparing rendering changes
+        self.queries_answered = 0
+        self.query_seconds = 0.0
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        # Ignore messages from the bot itself or DMs
-        if message.author == self.bot.user or isinstance(message.channel, discord.DMChannel):
-            return
-        
-        # This listener only handles currency commands that are NOT standard commands
-        # e.g., "!usd", "!usd100 myr"
-        if message.content.startswith(COMMAND_PREFIX):
-            ctx = await self.bot.get_context(message)
-            # If it's a valid, registered command, let the bot's main processor handle it.
-            if ctx.valid:
-                return
+    async def cog_load(self):
+        # Yesterday's tables from disk answer the first queries while the prefetch task refreshes them
+        await self.rate_cache.load_snapshot()
+        self._prefetch_task = asyncio.create_task(self.prefetch_rates())
+        # Button clicks are routed by custom_id, including those on messages sent before a restart
+        self.bot.add_dynamic_items(HistoryGraphButton, RatePageButton)
+        # Prefixed messages that aren't registered commands, e.g. "!usd", "!usd100 myr"
+        self.bot.router.shorthand_handler = self.handle_currency_command
+        # Pre-warm matplotlib in the render pool without delaying startup
+        self._warm_up_task = asyncio.create_task(self.graph_renderer.warm_up())
+        self._index_task = asyncio.create_task(self.load_currency_index())
 
-            await self.handle_currency_command(message)
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(HistoryGraphButton, RatePageButton)
+        self.bot.router.shorthand_handler = None
+        for task in (self._warm_up_task, self._index_task, self._prefetch_task):
+            if task:
+                task.cancel()
+        self.graph_renderer.close()
+        self.rate_history.close()
 
+    @timed('task', 'load_currency_index')
+    async def load_currency_index(self):
+        """Replaces the built-in code list with the currencies in the live reference table."""
+        reference = await self.fetch_exchange_rates(RATE_REFERENCE_BASE)
+        if reference and reference.get('rates'):
+            self.currency_index.update([reference['base'], *reference['rates']])
+            log.info("Currency index loaded with %d codes", len(self.currency_index))
 
-    async def fetch_exchange_rates(self, base_currency: str, target_currency: str = None):
-        params = {'base': base_currency.upper()}
-        if target_currency:
-            params['to'] = target_currency.upper()
+    @timed('task', 'rate_prefetch')
+    async def refresh_rates(self):
+        await self.rate_cache.prefetch()
+        await self.rate_cache.save_snapshot()
+
+    async def prefetch_rates(self):
+        """Refreshes the common rate tables shortly after each publication, so queries never wait on upstream."""
+        # A snapshot of the latest publication needs no fetch until the next one is due
+        if self.rate_cache.is_current():
+            await asyncio.sleep(self.rate_cache.refresh_due_in() + RATE_PREFETCH_DELAY)
+        while True:
+            try:
+                await self.refresh_rates()
+                delay = self.rate_cache.refresh_due_in() + RATE_PREFETCH_DELAY
+            except (HTTPError, OSError) as e:
+                log.warning("Rate prefetch failed: %s", e)
+                delay = RATE_CACHE_RETRY_TTL
+            except Exception:
+                # Anything unexpected is logged and retried; it must never end the refresh task
+                log.exception("Rate prefetch failed")
+                delay = RATE_CACHE_RETRY_TTL
+            await asyncio.sleep(delay)
+
+    async def fetch_exchange_rates(self, base_currency: str):
+        """Returns the full rate table for a base currency from the rate cache."""
         try:
-            response = requests.get(BASE_CURRENCY_API_URL, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching exchange rates from API: {e}")
+            return await self.rate_cache.get_rates(base_currency)
+        except HTTPError as e:
+            log.warning("Error fetching exchange rates from API: %s", e, extra={'base': base_currency})
             return None
 
+    async def send_history_graph(self, interaction: discord.Interaction, base: str, target: str, num_days: int, label: str):
+        # Graph rendering can take a few seconds, so the click is acknowledged first
+        await interaction.response.defer(thinking=True)
+        try:
+            # Served from the local history store; only days not stored yet are downloaded.
+            dates, rates = await self.rate_history.get_series(base, target, num_days)
+            if not dates:
+                await interaction.followup.send("Sorry, no historical data found.")
+                return
+
+            # The same pair, window and data date always produce the same graph, so it is rendered once.
+            cache_key = (base, target, num_days, dates[-1])
+            graph_png = await self.graph_renderer.render(cache_key, dates, rates, base, target, num_days)
+
+            graph_file = discord.File(io.BytesIO(graph_png), filename=f"{base}-{target}_{label}_history.png")
+            await interaction.followup.send(file=graph_file)
+        except Exception:
+            log.exception("Error generating currency graph", extra={'base': base, 'target': target})
+            await interaction.followup.send("Sorry, an error occurred while creating the graph.")
+
+    @commands.command(name='ratestats', hidden=True)
+    @commands.is_owner()
+    async def rate_stats(self, ctx: commands.Context):
+        """Shows exchange-rate cache counters."""
+        stats = {**self.rate_cache.stats(), **self.graph_renderer.stats(), 'history_fetches': self.rate_history.upstream_fetches,
+                 'queries_answered': self.queries_answered,
+                 'avg_query_latency': self.query_seconds / self.queries_answered if self.queries_answered else 0.0}
+        lines = [f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}" for key, value in stats.items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
     async def handle_currency_command(self, message: discord.Message):
-        """Processes flexible currency conversion requests."""
-        full_command_parts = message.content[len(COMMAND_PREFIX):].strip().split()
-        if not full_command_parts:
+        """Processes flexible currency conversion requests. Called by the message router for prefixed non-commands."""
+        query = parse_conversion(message.content[len(COMMAND_PREFIX):], self.currency_index)
+        if query is None:
+            # Not a currency we know, e.g. "!lol"; nothing is sent or fetched
             return
-
-        base_currency, amount, target_currency = None, 1.0, None
-        first_arg = full_command_parts[0]
-        currency_amount_match = re.match(r'^([A-Z]{2,4})(\d*\.?\d*)?$', first_arg, re.IGNORECASE)
-
-        if currency_amount_match:
-            base_currency = currency_amount_match.group(1).upper()
-            if attached_amount_str := currency_amount_match.group(2):
-                try: amount = float(attached_amount_str)
-                except ValueError: amount = 1.0
-            
-            if len(full_command_parts) > 1:
-                second_arg = full_command_parts[1]
-                if re.match(r'^\d+(\.\d+)?$', second_arg):
-                    try:
-                        amount = float(second_arg)
-                        if len(full_command_parts) > 2:
-                            target_currency = full_command_parts[2].upper()
-                    except ValueError: pass
-                else:
-                    target_currency = second_arg.upper()
-        else:
-            # Not a currency command format we handle here
+        base_currency, amount = query.base, query.amount
+        if query.unknown_targets and not query.targets:
+            await message.channel.send(self.unknown_currency_message(query.unknown_targets))
             return
 
-        status_message = await message.channel.send(f"Fetching exchange rates for **{base_currency}**...")
-        rates_data = await self.fetch_exchange_rates(base_currency, target_currency)
+        started_at = time.perf_counter()
+        # Only say we're fetching when the table isn't cached already; otherwise the answer is the one message sent
+        status_message = None
+        if not self.rate_cache.is_cached():
+            status_message = await message.channel.send(f"Fetching exchange rates for **{base_currency}**...")
+        rates_data = await self.fetch_exchange_rates(base_currency)
+
+        async def reply(**kwargs):
+            if status_message:
+                await status_message.edit(**kwargs)
+            else:
+                await message.channel.send(**kwargs)
 
         if rates_data and 'rates' in rates_data:
             base = rates_data.get('base')
             date = rates_data.get('date')
             rates = rates_data.get('rates')
-            header = f"**Exchange Rates for {amount:.2f} {base} (as of {date}):**\n"
-
-            if target_currency:
-                if rate_for_one := rates.get(target_currency):
-                    calculated_rate = rate_for_one * amount
-                    response_message = header + f"**{amount:.2f} {base} = {calculated_rate:.4f} {target_currency}**"
-                    view = HistoricalGraphView(base_currency=base, target_currency=target_currency)
-                    await status_message.edit(content=response_message, view=view)
-                else:
-                    await status_message.edit(content=f"Could not find rate for `{target_currency}`.")
+
+            if query.targets:
+                header = f"**Exchange Rates for {amount:.2f} {base} (as of {date}):**\n"
+                # Every target is answered from the one table fetched for the base
+                result_lines = [
+                    f"**{amount:.2f} {base} = {rates[target] * amount:.4f} {target}**" if target in rates
+                    else f"Could not find rate for `{target}`."
+                    for target in query.targets
+                ]
+                if query.unknown_targets:
+                    result_lines.append(self.unknown_currency_message(query.unknown_targets))
+                # The history graph is drawn for a single pair
+                view = None
+                if len(query.targets) == 1 and query.targets[0] in rates:
+                    view = build_history_graph_view(base, query.targets[0])
+                await reply(content=header + "\n".join(result_lines), view=view)
             else:
-                # Code to display all rates (unchanged)
-                await status_message.edit(content=header)
-                rate_lines = [f"  - {currency}: {(rate_val * amount):.4f}" for currency, rate_val in rates.items()]
-                current_chunk = ""
-                for line in rate_lines:
-                    if len(current_chunk) + len(line) + 1 > 1900:
-                        await message.channel.send(f"```\n{current_chunk}\n```")
-                        current_chunk = line
-                    else:
-                        current_chunk += "\n" + line
-                if current_chunk:
-                    await message.channel.send(f"```\n{current_chunk}\n```")
+                # The whole table goes out as one embed, paged with buttons if it doesn't fit
+                pages = build_rate_table_pages(rates, amount)
+                view = build_rate_table_view(base, amount, 0, len(pages)) if len(pages) > 1 else None
+                await reply(content=None, embed=build_rate_table_embed(base, date, amount, pages[0], 0, len(pages)), view=view)
+            self.queries_answered += 1
+            self.query_seconds += time.perf_counter() - started_at
         else:
-            await status_message.edit(content=f"Sorry, I couldn't fetch exchange rates for `{base_currency}`.")
+            await reply(content=f"Sorry, I couldn't fetch exchange rates for `{base_currency}`.")
+
+    def unknown_currency_message(self, tokens: list) -> str:
+        hints = []
+        for token in tokens:
+            suggestions = self.currency_index.suggest(token)
+            hint = f"`{token}`"
+            if suggestions:
+                hint += " (did you mean " + ", ".join(f"`{code}`" for code in suggestions) + "?)"
+            hints.append(hint)
+        return "Unknown currency: " + "; ".join(hints)
 
 # This setup function is required by discord.py to load the cog
 async def setup(bot: commands.Bot):
@@ -21,7 +21,10 @@ class GeneralCog(commands.Cog):
         embed.add_field(
             name="🤖 AI Chat Functionality",
             # The mention will also be dynamic to your bot's name
-            value=f"To chat with the AI, simply mention the bot (`@{self.bot.user.name}`) followed by your question.",
+            value=(
+                f"To chat with the AI, simply mention the bot (`@{self.bot.user.name}`) followed by your question.\n"
+                f"The AI remembers the recent conversation in each channel. Use `{config.COMMAND_PREFIX}forget` to clear it."
+            ),
             inline=False
         )
         embed.add_field(
@@ -30,7 +33,8 @@ class GeneralCog(commands.Cog):
                 f"**Get all rates for a currency:** `{config.COMMAND_PREFIX}usd`\n"
                 f"**Get rates for a specific amount:** `{config.COMMAND_PREFIX}usd100` or `{config.COMMAND_PREFIX}usd 100`\n"
                 f"**Convert to a specific currency:** `{config.COMMAND_PREFIX}usd myr`\n"
-                f"**Convert a specific amount:** `{config.COMMAND_PREFIX}usd100 myr` or `{config.COMMAND_PREFIX}usd 100 myr`\n\n"
+                f"**Convert a specific amount:** `{config.COMMAND_PREFIX}usd100 myr` or `{config.COMMAND_PREFIX}usd 100 myr`\n"
+                f"**Convert to several currencies:** `{config.COMMAND_PREFIX}usd100 myr sgd eur`\n\n"
                 f"Click `📈` on conversions to see a history graph."
             ),
             inline=False
@@ -40,7 +44,8 @@ class GeneralCog(commands.Cog):
             value=(
                 f"**Register your sign:** `{config.COMMAND_PREFIX}reg`\n"
                 f"**Modify your sign:** `{config.COMMAND_PREFIX}mod`\n"
-                f"**Remove your record:** `{config.COMMAND_PREFIX}remove`\n\n"
+                f"**Remove your record:** `{config.COMMAND_PREFIX}remove`\n"
+                f"**Choose your delivery time:** `{config.COMMAND_PREFIX}time 07:30 Asia/Kuala_Lumpur`\n\n"
                 f"Once registered, you will automatically receive your horoscope via DM every day!"
             ),
             inline=False
@@ -48,6 +53,29 @@ class GeneralCog(commands.Cog):
         embed.set_footer(text="Made with ❤️ by Jenny")
         await ctx.send(embed=embed)
 
+    @commands.command(name='stats', hidden=True)
+    @commands.is_owner()
+    async def stats(self, ctx: commands.Context, limit: int = 15):
+        """Shows event-loop lag and the operations that took the most total time."""
+        metrics = self.bot.metrics
+        lines = [
+            f"loop lag: {metrics.loop_lag * 1000:.1f}ms (max {metrics.loop_lag_max * 1000:.1f}ms)",
+            f"{'operation':<32} {'count':>7} {'err':>4} {'p50ms':>8} {'p99ms':>8} {'total s':>8}",
+        ]
+        for (kind, name), timing in metrics.timings()[:limit]:
+            lines.append(
+                f"{(kind + ':' + name)[:32]:<32} {timing.count:>7} {timing.errors:>4} "
+                f"{timing.quantile(0.5) * 1000:>8.1f} {timing.quantile(0.99) * 1000:>8.1f} {timing.total:>8.1f}"
+            )
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @commands.command(name='routestats', hidden=True)
+    @commands.is_owner()
+    async def route_stats(self, ctx: commands.Context):
+        """Shows how many messages the router sent down each path."""
+        lines = [f"{key}: {value}" for key, value in self.bot.router.stats().items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
 # This setup function is required by discord.py to load the cog
 async def setup(bot: commands.Bot):
     await bot.add_cog(GeneralCog(bot))
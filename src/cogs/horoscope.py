@@ -1,50 +1,43 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import ui
-import requests
-import json
-import os
+import asyncio
 import datetime
+import logging
 
 # Import config variables
-from src.config import USER_DATA_FILE, COMMAND_PREFIX
+from src.config import COMMAND_PREFIX, IS_LEADER_PROCESS
+from src.user_store import open_user_store
+from src.horoscope_cache import HoroscopeCache
+from src.broadcast import Broadcaster
+from src.delivery_schedule import DeliveryScheduler, local_date, parse_delivery_time
+from src.instrumentation import timed
 
-# --- Helper Functions for Horoscope ---
+log = logging.getLogger(__name__)
 
-def load_user_data():
-    if not os.path.exists(USER_DATA_FILE):
-        return {}
-    try:
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+# --- Helper Functions for Horoscope ---
 
-def save_user_data(data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def build_horoscope_embed(sign: str, data: dict) -> discord.Embed:
+    horoscope_text = data.get('horoscope_data', 'No horoscope data found.')
+    embed = discord.Embed(
+        title=f"✨ Daily Horoscope for {sign} ✨",
+        description=horoscope_text,
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text=f"Date: {data.get('date')}")
+    return embed
 
-async def fetch_and_send_horoscope(destination, sign: str, user: discord.User = None):
-    url = f"https://horoscope-app-api.vercel.app/api/v1/get-horoscope/daily?sign={sign.capitalize()}&day=TODAY"
+async def fetch_and_send_horoscope(horoscope_cache: HoroscopeCache, destination, sign: str, user: discord.User = None, day: datetime.date = None):
     try:
-        # Send a "thinking" message only if the destination is a channel
-        if isinstance(destination, (discord.TextChannel, commands.Context)):
+        # Send a "thinking" message only if the destination is a channel and we actually have to wait
+        if isinstance(destination, (discord.TextChannel, commands.Context)) and not horoscope_cache.is_cached(sign, day):
             mention_text = f"{user.mention}, " if user else ""
             await destination.send(f"{mention_text}fetching today's horoscope for **{sign}**...")
 
-        response = requests.get(url)
-        response.raise_for_status()
-        horoscope_data = response.json()
-
-        if horoscope_data.get('success') and 'data' in horoscope_data:
-            data = horoscope_data['data']
-            horoscope_text = data.get('horoscope_data', 'No horoscope data found.')
-            embed = discord.Embed(
-                title=f"✨ Daily Horoscope for {sign} ✨",
-                description=horoscope_text,
-                color=discord.Color.purple()
-            )
-            embed.set_footer(text=f"Date: {data.get('date')}")
+        data = await horoscope_cache.get(sign, day)
+
+        if data is not None:
+            embed = build_horoscope_embed(sign, data)
             # If the original destination was a context, use its channel
             if isinstance(destination, commands.Context):
                 await destination.channel.send(embed=embed)
@@ -54,14 +47,18 @@ async def fetch_and_send_horoscope(destination, sign: str, user: discord.User =
             await destination.send("Sorry, I couldn't retrieve the horoscope right now.")
             
     except Exception as e:
-        print(f"Horoscope fetch error for {sign}: {e}")
+        log.warning("Horoscope fetch error for %s: %s", sign, e)
         await destination.send("Sorry, there was an error connecting to the horoscope service.")
 
 
 # --- UI Components for Horoscope ---
 
-class ZodiacSelect(ui.Select):
-    def __init__(self):
+class ZodiacSelect(ui.DynamicItem[ui.Select], template=r'horoscope:sign:(?P<owner>\d+)'):
+    """
+    The sign picker sent by !reg and !mod. The owner's id is part of the custom_id, so picks are
+    dispatched without keeping a view per message and menus sent before a restart still work.
+    """
+    def __init__(self, owner_id: int):
         options = [
             discord.SelectOption(label="Aries", emoji="♈"), discord.SelectOption(label="Taurus", emoji="♉"),
             discord.SelectOption(label="Gemini", emoji="♊"), discord.SelectOption(label="Cancer", emoji="♋"),
@@ -70,69 +67,121 @@ class ZodiacSelect(ui.Select):
             discord.SelectOption(label="Sagittarius", emoji="♐"), discord.SelectOption(label="Capricorn", emoji="♑"),
             discord.SelectOption(label="Aquarius", emoji="♒"), discord.SelectOption(label="Pisces", emoji="♓"),
         ]
-        super().__init__(placeholder="Choose your zodiac sign...", min_values=1, max_values=1, options=options)
+        super().__init__(ui.Select(
+            placeholder="Choose your zodiac sign...", min_values=1, max_values=1, options=options,
+            custom_id=f"horoscope:sign:{owner_id}",
+        ))
+        self.owner_id = owner_id
 
-    async def callback(self, interaction: discord.Interaction):
-        user_id = str(interaction.user.id)
-        selected_sign = self.values[0]
-        users = load_user_data()
-        is_update = user_id in users
-        users[user_id] = selected_sign
-        save_user_data(users)
-        
-        confirmation_message = f"✅ Your sign is updated to **{selected_sign}**!" if is_update else f"✅ Your sign is registered as **{selected_sign}**!"
-        await interaction.response.edit_message(content=confirmation_message, view=None)
-        await fetch_and_send_horoscope(interaction.channel, selected_sign, user=interaction.user)
-
-class ZodiacSelectionView(ui.View):
-    def __init__(self, author: discord.User, *, timeout=120):
-        super().__init__(timeout=timeout)
-        self.author = author
-        self.add_item(ZodiacSelect())
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Select, match):
+        return cls(int(match['owner']))
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.user.id != self.author.id:
+        if interaction.user.id != self.owner_id:
             await interaction.response.send_message("This menu is not for you.", ephemeral=True)
             return False
         return True
 
+    @timed('view', 'zodiac_select')
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog('HoroscopeCog')
+        user_id = str(interaction.user.id)
+        selected_sign = self.item.values[0]
+        is_update = await cog.user_store.get(user_id) is not None
+        await cog.user_store.set(user_id, selected_sign)
+        # A delivery time chosen before registering is picked up here
+        cog.scheduler.add(user_id, await cog.delivery_times.get(user_id))
+
+        confirmation_message = f"✅ Your sign is updated to **{selected_sign}**!" if is_update else f"✅ Your sign is registered as **{selected_sign}**!"
+        await interaction.response.edit_message(content=confirmation_message, view=None)
+        await fetch_and_send_horoscope(cog.horoscope_cache, interaction.channel, selected_sign, user=interaction.user, day=await cog.local_date(user_id))
+
+def build_zodiac_view(owner: discord.User) -> ui.View:
+    # Stopped so discord.py doesn't store it; the select is dispatched by its custom_id
+    view = ui.View(timeout=None)
+    view.add_item(ZodiacSelect(owner.id))
+    view.stop()
+    return view
+
 # --- Main Cog Class ---
 
 class HoroscopeCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # Start the background task when the cog is loaded
-        self.send_daily_horoscopes.start()
+        self.broadcaster = Broadcaster(bot)
+        # Horoscopes per sign and date, shared by the broadcast and the interactive commands
+        self.horoscope_cache = HoroscopeCache(bot.http_client)
+        self.user_store = None
+        self.delivery_times = None
+        # Sends each user's horoscope at their own time of day instead of everyone at midnight
+        self.scheduler = DeliveryScheduler(self.deliver_bucket, self.load_schedule, prefetch=self.prefetch_bucket)
+        self._scheduler_start = None
+        self._prefetches = {} # local date -> task fetching all 12 signs for it
 
-    def cog_unload(self):
-        # Stop the task when the cog is unloaded
-        self.send_daily_horoscopes.cancel()
+    async def cog_load(self):
+        # Sign picks are routed by custom_id, including menus sent before a restart
+        self.bot.add_dynamic_items(ZodiacSelect)
+        # Open the registration store (migrating the old JSON file if needed) before anything reads it
+        self.user_store = await open_user_store()
+        self.delivery_times = await open_user_store(collection='delivery_times')
+        # In a multi-process deployment only the leader sends horoscopes
+        if IS_LEADER_PROCESS:
+            self._scheduler_start = asyncio.create_task(self.start_scheduler())
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(ZodiacSelect)
+        if self._scheduler_start:
+            self._scheduler_start.cancel()
+        await self.scheduler.stop()
+        for task in self._prefetches.values():
+            task.cancel()
+        for store in (self.user_store, self.delivery_times):
+            if store:
+                await store.close()
+
+    async def start_scheduler(self):
+        # Wait for the member cache, so deliveries can resolve users without REST lookups
+        await self.bot.wait_until_ready()
+        self.scheduler.start()
+
+    async def load_schedule(self):
+        return await self.user_store.all(), await self.delivery_times.all()
+
+    async def local_date(self, user_id: str) -> datetime.date:
+        """Today's date where the user is, from their stored delivery time (the scheduler only runs on the leader)."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delivery_time = await self.delivery_times.get(user_id) or self.scheduler.default_time
+        if delivery_time:
+            try:
+                return local_date(delivery_time, now)
+            except ValueError:
+                pass
+        return now.date()
 
     # Note: Decorator changes from @bot.command to @commands.command
     @commands.command(name='reg', help="Register for daily horoscopes or see your current one.")
     async def reg(self, ctx: commands.Context):
         user_id = str(ctx.author.id)
-        users = load_user_data()
-        if user_id in users:
-            sign = users[user_id]
-            await fetch_and_send_horoscope(ctx, sign, user=ctx.author)
+        sign = await self.user_store.get(user_id)
+        if sign:
+            await fetch_and_send_horoscope(self.horoscope_cache, ctx, sign, user=ctx.author, day=await self.local_date(user_id))
             await ctx.send(f"*(Tip: Use `{COMMAND_PREFIX}mod` to update your sign.)*", delete_after=20)
         else:
-            view = ZodiacSelectionView(author=ctx.author)
+            view = build_zodiac_view(ctx.author)
             await ctx.send(f"Welcome, {ctx.author.mention}! Please select your sign to register:", view=view)
 
     @commands.command(name='mod', help="Modify your registered zodiac sign.")
     async def mod(self, ctx: commands.Context):
-        view = ZodiacSelectionView(author=ctx.author)
+        view = build_zodiac_view(ctx.author)
         await ctx.send(f"{ctx.author.mention}, please select your new sign:", view=view)
 
     @commands.command(name='remove', help="Remove your horoscope registration.")
     async def remove_record(self, ctx: commands.Context):
         user_id = str(ctx.author.id)
-        users = load_user_data()
-        if user_id in users:
-            del users[user_id]
-            save_user_data(users)
+        if await self.user_store.delete(user_id):
+            await self.delivery_times.delete(user_id)
+            self.scheduler.remove(user_id)
             await ctx.send(f"✅ Your record has been deleted. Use `{COMMAND_PREFIX}reg` to register again.")
         else:
             await ctx.send(f"You don't have a registered sign to delete.")
@@ -142,38 +191,81 @@ class HoroscopeCog(commands.Cog):
     async def test_daily_horoscopes(self, ctx: commands.Context):
         await ctx.message.add_reaction('🧪')
         owner_id = str(ctx.author.id)
-        users = load_user_data()
-        if owner_id in users:
-            sign = users[owner_id]
+        sign = await self.user_store.get(owner_id)
+        if sign:
             await ctx.author.send(f"✅ Running a test for your sign: **{sign}**.")
-            await fetch_and_send_horoscope(ctx.author, sign, user=ctx.author)
+            await fetch_and_send_horoscope(self.horoscope_cache, ctx.author, sign, user=ctx.author, day=await self.local_date(owner_id))
         else:
             await ctx.author.send(f"⚠️ You are not registered. Use `{COMMAND_PREFIX}reg` first.")
 
-    # Note: Decorator changes from @tasks.loop to @tasks.loop
-    # Define the time for the task to run (UTC)
-    @tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=datetime.timezone.utc))
-    async def send_daily_horoscopes(self):
-        print(f"[{datetime.datetime.now()}] Running daily horoscope task...")
-        users = load_user_data()
-        if not users:
+    @commands.command(name='time', help="Choose when your daily horoscope arrives, e.g. `!time 07:30 Asia/Kuala_Lumpur`.")
+    async def delivery_time(self, ctx: commands.Context, *, when: str = None):
+        user_id = str(ctx.author.id)
+        if when is None:
+            current = await self.delivery_times.get(user_id)
+            due = self.scheduler.next_delivery(user_id, current)
+            described = f"**{current}**" if current else "the default time"
+            await ctx.send(f"Your horoscope is sent at {described}; the next one arrives <t:{int(due.timestamp())}:R> (<t:{int(due.timestamp())}:t> your time).")
+            return
+        if when.lower() == 'reset':
+            await self.delivery_times.delete(user_id)
+            self.scheduler.clear_time(user_id)
+            await ctx.send("✅ Your delivery time is back to the default.")
             return
 
-        for user_id, sign in users.items():
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                if user:
-                    print(f"Sending horoscope to {user.name} for sign {sign}")
-                    await fetch_and_send_horoscope(user, sign)
-            except (discord.NotFound, discord.Forbidden) as e:
-                print(f"Cannot send horoscope to user {user_id}: {e}")
-            except Exception as e:
-                print(f"An error occurred processing user {user_id}: {e}")
-        print("Daily horoscope task finished.")
-        
-    @send_daily_horoscopes.before_loop
-    async def before_daily_task(self):
-        await self.bot.wait_until_ready() # Wait for the bot to be ready before starting the loop
+        delivery_time = parse_delivery_time(when)
+        if delivery_time is None:
+            await ctx.send(
+                f"Sorry, I didn't understand that. Use a 24-hour time and optionally a timezone, e.g. "
+                f"`{COMMAND_PREFIX}time 07:30`, `{COMMAND_PREFIX}time 07:30 +08:00` or `{COMMAND_PREFIX}time 07:30 Europe/London`."
+            )
+            return
+        await self.delivery_times.set(user_id, delivery_time)
+        if await self.user_store.get(user_id):
+            self.scheduler.add(user_id, delivery_time)
+        due = self.scheduler.next_delivery(user_id, delivery_time)
+        await ctx.send(f"✅ Your horoscope will arrive daily at **{delivery_time}**, next <t:{int(due.timestamp())}:R>.")
+
+    @commands.command(name='horostats', hidden=True)
+    @commands.is_owner()
+    async def horoscope_stats(self, ctx: commands.Context):
+        """Shows delivery-schedule lag and the most recent minute buckets."""
+        stats = {**self.scheduler.stats(), 'running': self.scheduler.running}
+        lines = [f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}" for key, value in stats.items()]
+        lines.append("recent buckets (UTC minute: users/sent, lag):")
+        for day, minute, users, sent, lag in list(self.scheduler.recent_buckets)[-10:]:
+            lines.append(f"  {day} {minute // 60:02d}:{minute % 60:02d}: {users}/{sent}, {lag:.1f}s")
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    async def broadcast(self, users: dict) -> dict:
+        """Sends the horoscope to every {user_id: (sign, date)} through the rate-limited broadcaster."""
+        async def send(user: discord.User, horoscope: tuple):
+            sign, day = horoscope
+            await fetch_and_send_horoscope(self.horoscope_cache, user, sign, day=day)
+
+        # Users are served concurrently by a bounded, rate-limited worker pool
+        return await self.broadcaster.run(users, send)
+
+    async def prefetch_bucket(self, user_ids: list, due: datetime.datetime):
+        """Called by the scheduler a minute before a bucket: fetches all 12 signs for each local date in it that has none cached yet."""
+        self._prefetches = {day: task for day, task in self._prefetches.items() if not task.done()}
+        for day in {self.scheduler.local_date(user_id, due) for user_id in user_ids}:
+            if day not in self._prefetches and not self.horoscope_cache.cached_signs(day):
+                # In the background, so a slow horoscope API never holds up the scheduler
+                self._prefetches[day] = asyncio.create_task(self._prefetch_day(day))
+
+    async def _prefetch_day(self, day: datetime.date):
+        cached_signs = await self.horoscope_cache.prefetch_all(day)
+        log.info("Prefetched %d/12 signs for %s", cached_signs, day)
+
+    async def deliver_bucket(self, user_ids: list, due: datetime.datetime = None) -> dict:
+        """Called by the scheduler with the users due in one minute; each gets the horoscope for their local date at `due`."""
+        due = due or datetime.datetime.now(datetime.timezone.utc)
+        users = {}
+        for user_id in user_ids:
+            if sign := await self.user_store.get(user_id):
+                users[user_id] = (sign, self.scheduler.local_date(user_id, due))
+        return await self.broadcast(users) if users else {}
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(HoroscopeCog(bot))
\ No newline at end of file
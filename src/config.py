@@ -1,4 +1,5 @@
 import os
+import datetime
 import discord
 from dotenv import load_dotenv
 
@@ -12,7 +13,11 @@ BOT_OWNER_ID_STR = os.getenv("BOT_OWNER_ID")
 
 # --- Bot Settings ---
 COMMAND_PREFIX = '!'
-USER_DATA_FILE = "horoscope_users.json" # Renamed for clarity
+USER_DATA_FILE = "horoscope_users.json" # Legacy JSON store, migrated into USER_DB_FILE on first start
+USER_DB_FILE = "horoscope_users.db"
+USER_STORE_BACKEND = "sqlite" # 'sqlite' or 'json'
+USER_STORE_FLUSH_DELAY = 2.0 # Seconds registration changes are batched before being written
+DELIVERY_DATA_FILE = "horoscope_delivery_times.json" # Preferred delivery times, for the 'json' backend
 
 # --- Sanity Checks ---
 if not DISCORD_BOT_TOKEN:
@@ -26,11 +31,136 @@ except (ValueError, TypeError):
     print(f"Warning: Invalid BOT_OWNER_ID. Owner-only commands may not work.")
     BOT_OWNER_ID = None
 
+# --- Sharding Settings ---
+# Unset: one process, one gateway connection. "auto": one process, shard count recommended by Discord.
+# A number: that many shards, split across SHARD_PROCESSES worker processes started by main.py.
+SHARD_COUNT_STR = os.getenv("BOT_SHARD_COUNT")
+SHARD_PROCESSES = int(os.getenv("BOT_SHARD_PROCESSES") or 1)
+# Set by the launcher for each worker process; not meant to be set by hand
+SHARD_IDS_STR = os.getenv("BOT_SHARD_IDS")
+PROCESS_INDEX = int(os.getenv("BOT_PROCESS_INDEX") or 0)
+WORKER_RESTART_DELAY = 5 # Seconds before the launcher restarts a crashed worker, doubled on each crash in a row
+WORKER_MAX_RESTART_DELAY = 5 * 60 # Upper bound for that delay
+WORKER_MAX_RESTARTS = 10 # Crashes in a row after which the launcher gives up and stops
+WORKER_STABLE_AFTER = 10 * 60 # Seconds a worker must run before its crash count starts over
+
+try:
+    SHARD_COUNT = int(SHARD_COUNT_STR) if SHARD_COUNT_STR and SHARD_COUNT_STR != "auto" else None
+except ValueError:
+    print(f"Warning: Invalid BOT_SHARD_COUNT {SHARD_COUNT_STR!r}. Running unsharded.")
+    SHARD_COUNT_STR, SHARD_COUNT = None, None
+SHARD_IDS = [int(shard_id) for shard_id in SHARD_IDS_STR.split(",")] if SHARD_IDS_STR else None
+SHARDED = SHARD_COUNT_STR is not None
+if SHARD_PROCESSES > 1 and SHARD_COUNT is None:
+    print("Warning: BOT_SHARD_PROCESSES needs a numeric BOT_SHARD_COUNT. Running in one process.")
+    SHARD_PROCESSES = 1
+# Only the leader process runs once-per-deployment work such as the daily horoscope broadcast
+IS_LEADER_PROCESS = PROCESS_INDEX == 0
+
 # --- API & AI Settings ---
 BASE_CURRENCY_API_URL = "https://api.frankfurter.dev/v1/latest"
-HISTORY_CURRENCY_API_URL = "https://currencyhistoryapi.tinaleewx99.workers.dev/"
+# Time-series endpoint; a date range is appended, e.g. ".../v1/2024-01-01..2024-12-31"
+HISTORY_CURRENCY_API_URL = "https://api.frankfurter.dev/v1/"
 DEFAULT_GEMINI_MODEL = 'gemini-1.5-flash'
-MIN_GEMINI_DELAY = 1.1 # Seconds
+HOROSCOPE_API_URL = "https://horoscope-app-api.vercel.app/api/v1/get-horoscope/daily"
+
+# --- AI Chat Admission Settings ---
+# Rates are in prompts per second; bursts are how many can be sent back to back.
+AI_WORKERS = 4 # Prompts answered concurrently
+AI_MAX_QUEUE = 100 # Prompts waiting beyond this are rejected
+AI_USER_RATE = 1 / 10 # One prompt every 10s per user...
+AI_USER_BURST = 3 # ...after an initial burst of 3
+AI_GUILD_RATE = 1 / 2
+AI_GUILD_BURST = 10
+AI_GLOBAL_RATE = 60 / 60 # Matched to the Gemini requests-per-minute quota
+AI_GLOBAL_BURST = 5
+AI_MAX_TRACKED_BUCKETS = 10000 # Idle user/guild buckets are pruned beyond this
+AI_STREAMING = True # Stream answers into the reply as they are generated
+AI_STREAM_EDIT_INTERVAL = 1.0 # Min seconds between edits of a streaming reply (Discord allows ~5 edits per 5s)
+
+# --- AI Conversation Memory Settings ---
+AI_MAX_SESSIONS = 1000 # Channels/threads with remembered history; least recently used are dropped
+AI_SESSION_IDLE_TIMEOUT = 30 * 60 # Seconds of silence before a channel's history is forgotten
+AI_CONTEXT_TOKEN_BUDGET = 4000 # Approximate tokens of history plus prompt sent with each question
+
+# --- AI Response Cache Settings ---
+AI_CACHE_TTL = 6 * 60 * 60 # Seconds a cached answer is reused
+AI_CACHE_MAX_BYTES = 8 * 1024 * 1024 # Total size of cached answers; least recently used are dropped
+AI_CACHE_SIMILARITY_THRESHOLD = None # e.g. 0.9 to also reuse answers for near-identical wording; None disables
+AI_CACHE_SIMILARITY_SCAN = 200 # Most recent entries compared by the similarity tier
+
+# --- Daily Horoscope Broadcast Settings ---
+# Each user gets their horoscope at their own time of day, so sends are spread over 24 hours.
+# Users without a preference get this time (e.g. "00:00 UTC"), or when None a fixed minute derived from their id.
+HOROSCOPE_DEFAULT_DELIVERY_TIME = None
+HOROSCOPE_SCHEDULE_RELOAD = 15 * 60 # Seconds between re-reading registrations, to pick up other processes' changes
+HOROSCOPE_RECENT_BUCKETS = 60 # Delivered minute buckets kept for !horostats
+BROADCAST_WORKERS = 20 # DMs in flight at once
+BROADCAST_RATE_PER_SECOND = 40 # Discord REST calls per second, kept below the global limit of 50
+BROADCAST_PROGRESS_EVERY = 500 # Log progress after this many users
+
+# --- Exchange Rate Cache Settings ---
+# Only the reference table is fetched; every other base is cross-derived from it.
+RATE_REFERENCE_BASE = "EUR"
+# Reference rates are published once per working day; a cached table is kept until the next one is due.
+RATE_PUBLICATION_TIME_UTC = datetime.time(hour=16, minute=0)
+RATE_CACHE_MIN_TTL = 60 # Seconds a freshly fetched table is always kept
+RATE_CACHE_RETRY_TTL = 15 * 60 # Seconds between checks when a new table is overdue
+RATE_SNAPSHOT_FILE = "rate_snapshot.json" # Last reference table, loaded at startup so the first queries don't wait on upstream
+RATE_PREFETCH_DELAY = 5 * 60 # Seconds after a table is due before the background refresh fetches it
+RATE_PREFETCH_BASES = ("USD", "EUR", "MYR", "SGD", "GBP", "JPY", "CNY") # Tables derived ahead of the first query
+
+# --- Currency Shorthand Settings ---
+# Codes accepted before the live list has been loaded from the reference table
+KNOWN_CURRENCIES = (
+    "AUD", "BGN", "BRL", "CAD", "CHF", "CNY", "CZK", "DKK", "EUR", "GBP", "HKD",
+    "HUF", "IDR", "ILS", "INR", "ISK", "JPY", "KRW", "MXN", "MYR", "NOK", "NZD",
+    "PHP", "PLN", "RON", "SEK", "SGD", "THB", "TRY", "USD", "ZAR",
+)
+# Extra names accepted in place of an ISO code
+CURRENCY_ALIASES = {"RMB": "CNY", "YUAN": "CNY", "RM": "MYR", "EURO": "EUR", "YEN": "JPY", "BAHT": "THB", "RUPEE": "INR", "WON": "KRW"}
+CURRENCY_MAX_TARGETS = 10 # Targets answered in one multi-currency conversion
+RATE_TABLE_PAGE_SIZE = 36 # Rates per page of the all-rates embed
+RATE_TABLE_COLUMNS = 3 # Inline embed fields the rates on a page are split across
+
+# --- History Graph Settings ---
+RATE_HISTORY_DB_FILE = "rate_history.db" # Local store of daily rates, filled incrementally
+# Graph windows offered on conversions: button label -> number of days
+HISTORY_WINDOWS = {'1M': 30, '1Y': 365, '5Y': 5 * 365}
+GRAPH_RENDER_WORKERS = 2 # Threads rendering graphs in parallel
+GRAPH_CACHE_SIZE = 128 # Rendered PNGs kept in memory
+
+# --- Outbound HTTP Settings ---
+# All cogs share one pooled aiohttp session owned by the bot.
+HTTP_TIMEOUT = 10 # Seconds, for the whole request
+HTTP_MAX_RETRIES = 2 # Extra attempts on timeouts, connection errors, 429 and 5xx
+HTTP_RETRY_BACKOFF = 0.5 # Seconds, doubled on each retry
+HTTP_MAX_RETRY_DELAY = 10 # Seconds; a longer Retry-After fails the request instead of waiting
+HTTP_POOL_LIMIT = 100 # Max open connections in total
+HTTP_LIMIT_PER_HOST = 10 # Max concurrent connections to a single upstream
+HTTP_DNS_CACHE_TTL = 300 # Seconds
+HTTP_KEEPALIVE_TIMEOUT = 30 # Seconds an idle connection is kept open
+HTTP_USER_AGENT = "dcjbot (discord.py)"
+
+# --- Logging Settings ---
+# Logging goes through a queue to a background thread, so formatting and writes never block the event loop.
+LOG_LEVEL = "INFO"
+LOG_JSON = True # One JSON object per line; False for plain text
+LOG_LEVELS = { # Per-logger overrides; cogs log as "src.cogs.<name>"
+    "discord": "INFO",
+    "discord.gateway": "WARNING",
+    "src.cogs.ai_chat": "INFO", # "DEBUG" also logs every prompt
+}
+LOG_SAMPLING = { # Logger -> keep one in N records per message (errors are always kept)
+    "src.broadcast.delivery": 100,
+}
+
+# --- Instrumentation Settings ---
+METRICS_HOST = "127.0.0.1" # Prometheus endpoint; keep it local and scrape through your own agent
+METRICS_PORT = 9108 # None disables the endpoint (timings are still shown by !stats)
+METRICS_WINDOW = 1000 # Recent samples kept per timed operation for quantiles
+LOOP_LAG_INTERVAL = 0.5 # Seconds between event-loop lag probes
+LOOP_LAG_WARN_AFTER = 0.25 # Log a warning when the loop was blocked this long; None disables
 
 # --- Bot Intents ---
 # Centralize intents here so they can be imported.
@@ -0,0 +1,112 @@
+import re
+
+# Import config variables
+from src import config
+
+# "usd", "usd100", "usd2.5" and a standalone amount such as "100"
+CURRENCY_AMOUNT_PATTERN = re.compile(r'^([A-Z]{2,10})(\d*\.?\d*)$', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r'^\d+(\.\d+)?$')
+
+# --- Currency Index ---
+
+class CurrencyIndex:
+    """
+    The set of currency codes the rates source knows about, plus aliases such as "RMB" -> "CNY".
+    Lookups are a single dict probe; a prefix trie over codes and aliases backs "did you mean" suggestions.
+    Starts from config.KNOWN_CURRENCIES and is replaced by the live code list once it has been fetched.
+    """
+    def __init__(self, codes=config.KNOWN_CURRENCIES, aliases=config.CURRENCY_ALIASES):
+        self.aliases = {alias.upper(): code.upper() for alias, code in aliases.items()}
+        self.update(codes)
+
+    def update(self, codes):
+        """Replaces the known codes, e.g. with the currencies in the latest reference table."""
+        codes = {code.upper() for code in codes}
+        lookup = {code: code for code in codes}
+        for alias, code in self.aliases.items():
+            if code in codes:
+                lookup.setdefault(alias, code)
+        trie = {}
+        for name in lookup:
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[''] = lookup[name]
+        self.codes = frozenset(codes)
+        self._lookup = lookup
+        self._trie = trie
+
+    def resolve(self, token: str):
+        """Returns the ISO code for a code or alias, or None if it isn't a currency."""
+        return self._lookup.get(token.upper())
+
+    def suggest(self, token: str, limit: int = 3) -> list:
+        """Returns up to `limit` codes sharing the longest known prefix with `token`."""
+        node = self._trie
+        for char in token.upper():
+            if char not in node:
+                break
+            node = node[char]
+        if node is self._trie:
+            return []
+        suggestions, stack = [], [node]
+        while stack and len(suggestions) < limit:
+            node = stack.pop()
+            for char in sorted(node, reverse=True):
+                if char == '':
+                    if node[char] not in suggestions:
+                        suggestions.append(node[char])
+                else:
+                    stack.append(node[char])
+        return suggestions[:limit]
+
+    def __len__(self):
+        return len(self.codes)
+
+# --- Parser ---
+
+class ConversionQuery:
+    """One parsed conversion request, e.g. "!usd100 myr sgd" -> base USD, amount 100, targets [MYR, SGD]."""
+    __slots__ = ('base', 'amount', 'targets', 'unknown_targets')
+
+    def __init__(self, base: str, amount: float, targets: list, unknown_targets: list):
+        self.base = base
+        self.amount = amount
+        self.targets = targets
+        self.unknown_targets = unknown_targets
+
+def parse_conversion(text: str, index: CurrencyIndex, max_targets: int = config.CURRENCY_MAX_TARGETS):
+    """
+    Parses the text after the command prefix. Returns a ConversionQuery, or None when the first
+    word isn't a known currency, so chatter like "!lol" is dropped before any network or Discord call.
+    """
+    parts = text.split()
+    if not parts:
+        return None
+    match = CURRENCY_AMOUNT_PATTERN.match(parts[0])
+    if not match:
+        return None
+    base = index.resolve(match.group(1))
+    if base is None:
+        return None
+
+    amount = 1.0
+    if attached_amount := match.group(2):
+        try:
+            amount = float(attached_amount)
+        except ValueError: # A lone "." after the code
+            return None
+
+    rest = parts[1:]
+    if rest and AMOUNT_PATTERN.match(rest[0]):
+        amount = float(rest[0])
+        rest = rest[1:]
+
+    targets, unknown_targets = [], []
+    for token in rest[:max_targets]:
+        code = index.resolve(token)
+        if code is None:
+            unknown_targets.append(token.upper())
+        elif code not in targets:
+            targets.append(code)
+    return ConversionQuery(base, amount, targets, unknown_targets)
@@ -0,0 +1,289 @@
+import asyncio
+import datetime
+import logging
+import re
+import time
+from collections import deque
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Import config variables
+from src import config
+from src.instrumentation import registry
+
+log = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+_OFFSET_PATTERN = re.compile(r'^(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
+# --- Delivery Times ---
+# A delivery time is stored as "HH:MM <zone>", where the zone is an IANA name ("Asia/Kuala_Lumpur"),
+# a fixed UTC offset ("+08:00") or "UTC". Named zones follow daylight saving time.
+
+def _parse_zone(zone: str):
+    if zone.upper() in ('UTC', 'GMT', 'Z'):
+        return 'UTC', datetime.timezone.utc
+    if match := _OFFSET_PATTERN.match(zone):
+        sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+        if hours > 14 or minutes >= 60:
+            return None
+        name = f"{sign}{hours:02d}:{minutes:02d}"
+        offset = datetime.timedelta(hours=hours, minutes=minutes)
+        return name, datetime.timezone(offset if sign == '+' else -offset)
+    try:
+        return zone, ZoneInfo(zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def parse_delivery_time(text: str):
+    """Parses "HH:MM [zone]" into its canonical stored form, or returns None if it isn't valid."""
+    parts = text.split()
+    if not 1 <= len(parts) <= 2 or not (match := _TIME_PATTERN.match(parts[0])):
+        return None
+    zone = _parse_zone(parts[1]) if len(parts) == 2 else ('UTC', datetime.timezone.utc)
+    if zone is None:
+        return None
+    return f"{int(match.group(1)):02d}:{match.group(2)} {zone[0]}"
+
+def utc_minute(delivery_time: str, day: datetime.date) -> int:
+    """Returns the minute of the UTC day on which a stored delivery time falls on `day`. Raises ValueError if it isn't valid."""
+    clock, zone = delivery_time.split(' ', 1)
+    hour, minute = map(int, clock.split(':'))
+    parsed_zone = _parse_zone(zone)
+    if parsed_zone is None:
+        raise ValueError(f"Unknown timezone in delivery time {delivery_time!r}")
+    local = datetime.datetime.combine(day, datetime.time(hour, minute), tzinfo=parsed_zone[1])
+    utc = local.astimezone(datetime.timezone.utc)
+    return utc.hour * 60 + utc.minute
+
+def local_date(delivery_time: str, at: datetime.datetime) -> datetime.date:
+    """Returns the date in a stored delivery time's zone at the UTC instant `at`. Raises ValueError if the zone isn't valid."""
+    zone = delivery_time.split(' ', 1)[1]
+    parsed_zone = _parse_zone(zone)
+    if parsed_zone is None:
+        raise ValueError(f"Unknown timezone in delivery time {delivery_time!r}")
+    return at.astimezone(parsed_zone[1]).date()
+
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+# --- Timing Wheel ---
+
+class DeliveryWheel:
+    """One slot per minute of the UTC day, each holding the users due in that minute."""
+    def __init__(self):
+        self._slots = [set() for _ in range(MINUTES_PER_DAY)]
+        self._minute_of = {} # user_id -> slot index
+
+    def place(self, user_id: str, minute: int):
+        self.remove(user_id)
+        self._slots[minute].add(user_id)
+        self._minute_of[user_id] = minute
+
+    def remove(self, user_id: str) -> bool:
+        minute = self._minute_of.pop(user_id, None)
+        if minute is None:
+            return False
+        self._slots[minute].discard(user_id)
+        return True
+
+    def minute_of(self, user_id: str):
+        return self._minute_of.get(user_id)
+
+    def slot(self, minute: int) -> set:
+        return self._slots[minute]
+
+    def clear(self):
+        for slot in self._slots:
+            slot.clear()
+        self._minute_of.clear()
+
+    def __len__(self):
+        return len(self._minute_of)
+
+# --- Scheduler ---
+
+class DeliveryScheduler:
+    """
+    Delivers each registered user's horoscope once per UTC day at their own minute.
+    Registrations sit in a DeliveryWheel; a background task walks the wheel minute by minute and
+    hands each due bucket to `deliver(user_ids, due)`, catching up on any minutes it fell behind on.
+    If given, `prefetch(user_ids, due)` is called a minute ahead of each bucket so its data can be warmed up.
+    `load()` must return ({user_id: sign}, {user_id: delivery time}); it is called at start, at each
+    new UTC day (so named zones follow DST) and every `reload_every` seconds.
+    """
+    def __init__(self, deliver, load, *, prefetch=None, default_time: str = config.HOROSCOPE_DEFAULT_DELIVERY_TIME,
+                 reload_every: float = config.HOROSCOPE_SCHEDULE_RELOAD, recent: int = config.HOROSCOPE_RECENT_BUCKETS):
+        self.deliver = deliver
+        self.load = load
+        self.prefetch = prefetch
+        self.default_time = default_time
+        self.reload_every = reload_every
+        self.wheel = DeliveryWheel()
+        self._times = {} # user_id -> stored delivery time, for users with a preference
+        self._day = _utc_now().date()
+        self._cursor = None # Last minute of the day whose bucket was handled
+        self._delivered = set() # Users already served today, so moving a user never sends twice
+        self._loaded_at = 0.0
+        self._task = None
+        # --- Metrics ---
+        self.buckets_delivered = 0
+        self.users_delivered = 0
+        self.max_lag = 0.0
+        self.recent_buckets = deque(maxlen=recent) # (day, minute, users, sent, lag seconds)
+
+    # --- Registrations ---
+
+    def _spread_minute(self, user_id: str) -> int:
+        # No preference: a fixed minute derived from the id spreads these users over the day
+        return int(user_id) % MINUTES_PER_DAY if user_id.isdigit() else hash(user_id) % MINUTES_PER_DAY
+
+    def _minute_for(self, user_id: str) -> int:
+        delivery_time = self._times.get(user_id) or self.default_time
+        if delivery_time:
+            try:
+                return utc_minute(delivery_time, self._day)
+            except ValueError as e:
+                # e.g. a zone that the installed tzdata no longer knows; the user still gets a delivery
+                log.warning("Ignoring delivery time for user %s: %s", user_id, e)
+        return self._spread_minute(user_id)
+
+    def local_date(self, user_id: str, at: datetime.datetime) -> datetime.date:
+        """The user's own date at the UTC instant `at`; users without a usable time zone get the UTC date."""
+        delivery_time = self._times.get(user_id) or self.default_time
+        if delivery_time:
+            try:
+                return local_date(delivery_time, at)
+            except ValueError:
+                pass # Already logged when the user was placed on the wheel
+        return at.astimezone(datetime.timezone.utc).date()
+
+    def add(self, user_id: str, delivery_time: str = None):
+        """Schedules a registered user, optionally with a new delivery time."""
+        if delivery_time:
+            self._times[user_id] = delivery_time
+        self.wheel.place(user_id, self._minute_for(user_id))
+
+    def clear_time(self, user_id: str):
+        self._times.pop(user_id, None)
+        if self.wheel.minute_of(user_id) is not None:
+            self.wheel.place(user_id, self._minute_for(user_id))
+
+    def remove(self, user_id: str):
+        self._times.pop(user_id, None)
+        self.wheel.remove(user_id)
+
+    def next_delivery(self, user_id: str, delivery_time: str = None) -> datetime.datetime:
+        """When a user (with their stored time, or `delivery_time` if given) is next due, in UTC."""
+        delivery_time = delivery_time or self._times.get(user_id) or self.default_time
+        now = _utc_now()
+        for day in (now.date(), now.date() + datetime.timedelta(days=1)):
+            minute = utc_minute(delivery_time, day) if delivery_time else self._spread_minute(user_id)
+            due = datetime.datetime.combine(day, datetime.time(minute // 60, minute % 60), tzinfo=datetime.timezone.utc)
+            if due > now:
+                break
+        return due
+
+    async def reload(self):
+        registrations, times = await self.load()
+        self._times = {user_id: delivery_time for user_id, delivery_time in times.items() if user_id in registrations}
+        self.wheel.clear()
+        for user_id in registrations:
+            self.wheel.place(user_id, self._minute_for(user_id))
+        self._loaded_at = time.monotonic()
+        log.info("Horoscope schedule loaded: %d users", len(self.wheel))
+
+    # --- Delivery Loop ---
+
+    async def _deliver_bucket(self, minute: int, now: datetime.datetime):
+        user_ids = self.wheel.slot(minute) - self._delivered
+        if not user_ids:
+            return
+        due = datetime.datetime.combine(self._day, datetime.time(minute // 60, minute % 60), tzinfo=datetime.timezone.utc)
+        lag = max(0.0, (now - due).total_seconds())
+        self._delivered |= user_ids
+        registry.observe('schedule', 'horoscope_bucket_lag', lag)
+        try:
+            with registry.time('task', 'horoscope_bucket'):
+                stats = await self.deliver(sorted(user_ids), due)
+        except Exception:
+            log.exception("Horoscope delivery failed for the %02d:%02d bucket", minute // 60, minute % 60)
+            stats = {}
+        self.buckets_delivered += 1
+        self.users_delivered += len(user_ids)
+        self.max_lag = max(self.max_lag, lag)
+        self.recent_buckets.append((self._day.isoformat(), minute, len(user_ids), stats.get('sent', 0), lag))
+
+    async def _catch_up(self, until_minute: int):
+        """Handles every bucket after the cursor up to and including `until_minute`."""
+        while self._cursor < until_minute:
+            self._cursor += 1
+            await self._deliver_bucket(self._cursor, _utc_now())
+
+    async def _prefetch_next(self, now: datetime.datetime):
+        """Hands the users due in the next minute to `prefetch`."""
+        due = now.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        user_ids = self.wheel.slot(due.hour * 60 + due.minute)
+        if due.date() == self._day:
+            user_ids = user_ids - self._delivered
+        if user_ids:
+            await self.prefetch(sorted(user_ids), due)
+
+    async def _tick(self, now: datetime.datetime):
+        if self._cursor is None:
+            await self.reload()
+            # Buckets that were due before startup are not sent again
+            self._cursor = now.hour * 60 + now.minute - 1
+        elif now.date() != self._day:
+            await self._catch_up(MINUTES_PER_DAY - 1)
+            # A failed reload is retried on the next tick
+            self._day, self._cursor, self._delivered, self._loaded_at = now.date(), -1, set(), 0.0
+            await self.reload()
+        elif time.monotonic() - self._loaded_at >= self.reload_every:
+            await self.reload()
+        await self._catch_up(now.hour * 60 + now.minute)
+        if self.prefetch:
+            await self._prefetch_next(now)
+
+    async def _run(self):
+        while True:
+            now = _utc_now()
+            try:
+                await self._tick(now)
+            except Exception:
+                # e.g. the shared database is locked; the next tick picks up where this one stopped
+                log.exception("Horoscope scheduler tick failed")
+            # Wake just after the next minute starts
+            await asyncio.sleep(60 - now.second - now.microsecond / 1_000_000 + 0.05)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='horoscope-scheduler')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        now = _utc_now()
+        current_minute = now.hour * 60 + now.minute
+        behind = current_minute - self._cursor if self._cursor is not None and now.date() == self._day else 0
+        upcoming = [len(self.wheel.slot((current_minute + offset) % MINUTES_PER_DAY)) for offset in range(1, 61)]
+        return {
+            'scheduled_users': len(self.wheel),
+            'custom_times': len(self._times),
+            'delivered_today': len(self._delivered),
+            'buckets_delivered': self.buckets_delivered,
+            'users_delivered': self.users_delivered,
+            'minutes_behind': max(0, behind),
+            'max_lag': self.max_lag,
+            'next_hour_users': sum(upcoming),
+            'next_hour_peak_bucket': max(upcoming),
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import io
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Import config variables
+from src import config
+
+log = logging.getLogger(__name__)
+
+# Colours matching matplotlib's 'dark_background' style, applied per figure instead of globally
+BACKGROUND_COLOR = 'black'
+FOREGROUND_COLOR = 'white'
+LINE_COLOR = 'cyan'
+GRID_COLOR = '#444444'
+
+# --- Rendering (runs inside the worker pool) ---
+
+def render_history_png(dates: list, rates: list, base_currency: str, target_currency: str, num_days: int) -> bytes:
+    """
+    Renders a currency history graph to PNG bytes.
+    Uses the object-oriented Figure/Agg API only, so no pyplot global state is shared between workers.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+
+    fig = Figure(facecolor=BACKGROUND_COLOR)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(BACKGROUND_COLOR)
+    for spine in ax.spines.values():
+        spine.set_color(FOREGROUND_COLOR)
+
+    x_values = [datetime.date.fromisoformat(date) for date in dates]
+    ax.set_title(f"{num_days}-Day History: {base_currency} to {target_currency}", color=FOREGROUND_COLOR)
+    ax.plot(x_values, rates, marker='o' if len(x_values) <= 60 else None, linestyle='-', color=LINE_COLOR)
+    locator = AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    ax.set_xlabel("Date", color=FOREGROUND_COLOR)
+    ax.set_ylabel(f"Rate (1 {base_currency} = X {target_currency})", color=FOREGROUND_COLOR)
+    ax.tick_params(axis='x', colors=FOREGROUND_COLOR, rotation=45)
+    ax.tick_params(axis='y', colors=FOREGROUND_COLOR)
+    ax.xaxis.get_offset_text().set_color(FOREGROUND_COLOR)
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5, color=GRID_COLOR)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', facecolor=fig.get_facecolor())
+    return buf.getvalue()
+
+def _warm_up_worker():
+    """Imports matplotlib and renders a throwaway graph so fonts and caches are loaded before the first click."""
+    render_history_png(['2024-01-01', '2024-01-02'], [1.0, 1.1], 'USD', 'EUR', 2)
+
+# --- Renderer ---
+
+class GraphRenderer:
+    """
+    Renders history graphs in a bounded thread pool and keeps the PNG bytes in an LRU cache
+    keyed by (base, target, window, data date), so repeat clicks are served from memory.
+    """
+    def __init__(self, max_workers: int = config.GRAPH_RENDER_WORKERS, cache_size: int = config.GRAPH_CACHE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='graph-render')
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict() # key -> PNG bytes, most recently used last
+        self._inflight = {} # key -> Future of a render in progress
+        self.hits = 0
+        self.renders = 0
+
+    async def warm_up(self):
+        """Pre-imports matplotlib in every worker thread."""
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _warm_up_worker) for _ in range(self.max_workers)))
+            log.info("Graph renderer warmed up")
+        except Exception as e:
+            log.warning("Graph renderer warm-up failed: %s", e)
+
+    def get_cached(self, key: tuple):
+        """Returns cached PNG bytes for the key, or None."""
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+        return png
+
+    def _store(self, key: tuple, png: bytes):
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def render(self, key: tuple, dates: list, rates: list, base_currency: str, target_currency: str, num_days: int) -> bytes:
+        """Returns the PNG for the key, rendering it once in the pool if it isn't cached yet."""
+        if (png := self.get_cached(key)) is not None:
+            return png
+        if (inflight := self._inflight.get(key)) is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, render_history_png, dates, rates, base_currency, target_currency, num_days)
+        self._inflight[key] = future
+        try:
+            png = await asyncio.shield(future)
+            self.renders += 1
+            self._store(key, png)
+            return png
+        finally:
+            del self._inflight[key]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {'graph_hits': self.hits, 'graph_renders': self.renders, 'graph_cached': len(self._cache)}
@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+import logging
+
+# Import config variables
+from src import config
+from src.http_client import HTTPClient
+
+log = logging.getLogger(__name__)
+
+ZODIAC_SIGNS = [
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces",
+]
+
+def _today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+class HoroscopeCache:
+    """
+    Holds each sign's horoscope per date, so the API is called at most once per sign and date no matter
+    how many users share it. Users are served the horoscope for their own local date, which can be a day
+    either side of the UTC date; entries older than that are dropped when the UTC date changes.
+    """
+    def __init__(self, http_client: HTTPClient, api_url: str = config.HOROSCOPE_API_URL):
+        self.http_client = http_client
+        self.api_url = api_url
+        self._day = _today()
+        self._entries = {} # (sign, date) -> {'date': ..., 'horoscope_data': ...}
+        self._inflight = {} # (sign, date) -> Future of a fetch in progress
+        self.hits = 0
+        self.upstream_fetches = 0
+
+    def _oldest_day(self) -> datetime.date:
+        return self._day - datetime.timedelta(days=1)
+
+    def _expire_if_stale(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            oldest = self._oldest_day()
+            self._entries = {key: data for key, data in self._entries.items() if key[1] >= oldest}
+
+    def is_cached(self, sign: str, day: datetime.date = None) -> bool:
+        self._expire_if_stale()
+        return (sign.capitalize(), day or self._day) in self._entries
+
+    def cached_signs(self, day: datetime.date = None) -> int:
+        """How many signs are cached for `day` (default: the UTC date)."""
+        self._expire_if_stale()
+        day = day or self._day
+        return sum(1 for sign in ZODIAC_SIGNS if (sign, day) in self._entries)
+
+    async def _fetch(self, sign: str, day: datetime.date):
+        self.upstream_fetches += 1
+        params = {'sign': sign, 'day': day.isoformat()}
+        horoscope_data = await self.http_client.get_json(self.api_url, params=params)
+        if horoscope_data.get('success') and 'data' in horoscope_data:
+            return horoscope_data['data']
+        return None
+
+    async def get(self, sign: str, day: datetime.date = None):
+        """
+        Returns a sign's horoscope data for `day` (default: the UTC date), or None if the service had nothing for it.
+        Raises HTTPError if the service can't be reached. Concurrent misses share one request.
+        """
+        self._expire_if_stale()
+        key = (sign.capitalize(), day or self._day)
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+        if (inflight := self._inflight.get(key)) is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._fetch(*key))
+        self._inflight[key] = future
+        try:
+            data = await asyncio.shield(future)
+        finally:
+            del self._inflight[key]
+        # Don't cache a failed lookup, or one for a date that expired while it was in flight
+        if data is not None and key[1] >= self._oldest_day():
+            self._entries[key] = data
+        return data
+
+    async def prefetch_all(self, day: datetime.date = None):
+        """Fetches every sign for `day` in parallel. Returns how many signs are now cached for it."""
+        results = await asyncio.gather(*(self.get(sign, day) for sign in ZODIAC_SIGNS), return_exceptions=True)
+        for sign, result in zip(ZODIAC_SIGNS, results):
+            if isinstance(result, Exception):
+                log.warning("Horoscope prefetch failed for %s: %s", sign, result)
+        return self.cached_signs(day)
@@ -0,0 +1,100 @@
+import asyncio
+import random
+import aiohttp
+from urllib.parse import urlsplit
+
+# Import config variables
+from src import config
+from src.instrumentation import registry
+
+# Upstream statuses that are worth retrying (rate limited or temporarily unavailable)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HTTPError(Exception):
+    """Raised when an outbound request still fails after all retries."""
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class HTTPClient:
+    """
+    A single pooled aiohttp session shared by every cog for outbound API calls.
+    Keeps connections alive, caches DNS, limits concurrency per host and retries
+    transient failures with exponential backoff.
+    """
+    def __init__(self, *, timeout: float = config.HTTP_TIMEOUT, max_retries: int = config.HTTP_MAX_RETRIES,
+                 backoff: float = config.HTTP_RETRY_BACKOFF, max_retry_delay: float = config.HTTP_MAX_RETRY_DELAY,
+                 limit: int = config.HTTP_POOL_LIMIT, limit_per_host: int = config.HTTP_LIMIT_PER_HOST,
+                 dns_ttl: int = config.HTTP_DNS_CACHE_TTL):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self._session: aiohttp.ClientSession = None
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def start(self):
+        """Creates the pooled session. Must be called from inside the running event loop."""
+        if not self.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': config.HTTP_USER_AGENT},
+        )
+
+    async def close(self):
+        if not self.closed:
+            await self._session.close()
+        self._session = None
+
+    def _retry_delay(self, attempt: int, retry_after: str = None) -> float:
+        """Honours a numeric Retry-After header, otherwise uses exponential backoff with jitter."""
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    async def get_json(self, url: str, params: dict = None):
+        """Performs a GET request and returns the decoded JSON body. Timed per upstream host, retries included."""
+        if self.closed:
+            raise HTTPError("HTTP client is not started.")
+        with registry.time('http', urlsplit(url).hostname or url):
+            return await self._get_json(url, params)
+
+    async def _get_json(self, url: str, params: dict = None):
+        for attempt in range(self.max_retries + 1):
+            is_last_attempt = attempt == self.max_retries
+            try:
+                async with self._session.get(url, params=params) as response:
+                    if response.status in RETRY_STATUSES and not is_last_attempt:
+                        delay = self._retry_delay(attempt, response.headers.get('Retry-After'))
+                        if delay > self.max_retry_delay:
+                            # Waiting that long would hold up every caller sharing this request
+                            raise HTTPError(f"GET {url} returned HTTP {response.status} with Retry-After {delay:.0f}s", status=response.status)
+                        await asyncio.sleep(delay)
+                        continue
+                    if response.status >= 400:
+                        raise HTTPError(f"GET {url} returned HTTP {response.status}", status=response.status)
+                    return await response.json(content_type=None)
+            except HTTPError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError covers a body that isn't valid JSON
+                if is_last_attempt or isinstance(e, ValueError):
+                    raise HTTPError(f"GET {url} failed: {e!r}") from e
+                await asyncio.sleep(self._retry_delay(attempt))
@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from aiohttp import web
+
+# Import config variables
+from src import config
+
+log = logging.getLogger(__name__)
+
+# --- Timings ---
+
+class Timing:
+    """Running totals for one timed operation, plus a window of recent samples for quantiles."""
+    __slots__ = ('count', 'errors', 'total', 'max', '_recent')
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, seconds: float, failed: bool = False):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if failed:
+            self.errors += 1
+        self._recent.append(seconds)
+
+    def quantile(self, fraction: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class MetricsRegistry:
+    """
+    Process-wide store of operation timings, keyed by (kind, name), e.g. ('command', 'reg'),
+    ('view', 'history_graph') or ('http', 'api.frankfurter.dev'). Also holds the event-loop lag.
+    """
+    def __init__(self, window: int = config.METRICS_WINDOW):
+        self.window = window
+        self._timings = {}
+        self.loop_lag = 0.0 # Most recent sample, in seconds
+        self.loop_lag_max = 0.0
+
+    def observe(self, kind: str, name: str, seconds: float, failed: bool = False):
+        timing = self._timings.get((kind, name))
+        if timing is None:
+            timing = self._timings[(kind, name)] = Timing(self.window)
+        timing.observe(seconds, failed)
+
+    @contextmanager
+    def time(self, kind: str, name: str):
+        """Times the enclosed block, including any awaits inside it."""
+        started_at = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(kind, name, time.perf_counter() - started_at, failed)
+
+    def timings(self) -> list:
+        """Returns [((kind, name), Timing)] with the most total time first."""
+        return sorted(self._timings.items(), key=lambda item: item[1].total, reverse=True)
+
+    def render_prometheus(self) -> str:
+        """Formats everything in the Prometheus text exposition format."""
+        lines = [
+            "# HELP dcjbot_duration_seconds Time spent in commands, views, tasks, message routes and upstream calls.",
+            "# TYPE dcjbot_duration_seconds summary",
+        ]
+        errors = []
+        for (kind, name), timing in sorted(self._timings.items()):
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            for fraction in (0.5, 0.9, 0.99):
+                lines.append(f'dcjbot_duration_seconds{{{labels},quantile="{fraction}"}} {timing.quantile(fraction):.6f}')
+            lines.append(f"dcjbot_duration_seconds_sum{{{labels}}} {timing.total:.6f}")
+            lines.append(f"dcjbot_duration_seconds_count{{{labels}}} {timing.count}")
+            errors.append(f"dcjbot_errors_total{{{labels}}} {timing.errors}")
+        lines += ["# HELP dcjbot_errors_total Timed operations that raised.", "# TYPE dcjbot_errors_total counter", *errors]
+        lines += [
+            "# HELP dcjbot_event_loop_lag_seconds How late the last loop-lag probe woke up.",
+            "# TYPE dcjbot_event_loop_lag_seconds gauge",
+            f"dcjbot_event_loop_lag_seconds {self.loop_lag:.6f}",
+            "# HELP dcjbot_event_loop_lag_max_seconds Worst loop-lag probe since start.",
+            "# TYPE dcjbot_event_loop_lag_max_seconds gauge",
+            f"dcjbot_event_loop_lag_max_seconds {self.loop_lag_max:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# The registry every component records into
+registry = MetricsRegistry()
+
+def timed(kind: str, name: str = None):
+    """Decorator that records every call of an async function, e.g. @timed('view', 'history_graph')."""
+    def decorator(func):
+        label = name or func.__name__
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with registry.time(kind, label):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- Event Loop Lag ---
+
+class LoopLagMonitor:
+    """
+    Sleeps for `interval` seconds in a loop and records how late each wake-up is.
+    A late wake-up means something ran on the loop without yielding for that long.
+    """
+    def __init__(self, metrics: MetricsRegistry = registry, *, interval: float = config.LOOP_LAG_INTERVAL,
+                 warn_after: float = config.LOOP_LAG_WARN_AFTER):
+        self.metrics = metrics
+        self.interval = interval
+        self.warn_after = warn_after
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.metrics.loop_lag = lag
+            self.metrics.loop_lag_max = max(self.metrics.loop_lag_max, lag)
+            self.metrics.observe('loop', 'lag', lag)
+            if self.warn_after and lag >= self.warn_after:
+                log.warning("Event loop was blocked for %.0fms", lag * 1000, extra={'lag_ms': round(lag * 1000)})
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='loop-lag-monitor')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+# --- Prometheus Endpoint ---
+
+class MetricsServer:
+    """Serves the registry at http://<host>:<port>/metrics for Prometheus to scrape."""
+    def __init__(self, metrics: MetricsRegistry = registry, *, host: str = config.METRICS_HOST, port: int = config.METRICS_PORT):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _handle_metrics(self, request: web.Request):
+        return web.Response(text=self.metrics.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,130 @@
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Import config variables
+from src import config
+from src.user_store import migrate_legacy_stores
+
+log = logging.getLogger(__name__)
+
+# Exit code of a worker that can't start and shouldn't be restarted (sysexits EX_CONFIG)
+EXIT_FATAL = 78
+
+def shard_ranges(shard_count: int, processes: int) -> list:
+    """Splits shard ids 0..shard_count-1 into `processes` contiguous, near-equal ranges."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+class ShardLauncher:
+    """
+    Runs one bot process per shard range and restarts any that crash, until it is told to stop.
+    Each worker gets its shard ids and process index through the environment; process 0 is the leader.
+    A worker that exits with EXIT_FATAL (bad token or configuration) stops the whole deployment, since
+    restarting it can't help; one that exits cleanly is not restarted.
+    """
+    def __init__(self, script: str, shard_count: int = config.SHARD_COUNT, processes: int = config.SHARD_PROCESSES,
+                 restart_delay: float = config.WORKER_RESTART_DELAY, max_restart_delay: float = config.WORKER_MAX_RESTART_DELAY,
+                 max_restarts: int = config.WORKER_MAX_RESTARTS, stable_after: float = config.WORKER_STABLE_AFTER,
+                 poll_interval: float = 1.0):
+        self.script = script
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, processes)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.max_restarts = max_restarts
+        self.stable_after = stable_after
+        self.poll_interval = poll_interval
+        self._workers = {} # process index -> Popen
+        self._started_at = {} # process index -> monotonic time the current worker was started
+        self._crashes = {} # process index -> crashes in a row
+        self._stopping = False
+        self.spawned = 0
+
+    def _spawn(self, index: int) -> subprocess.Popen:
+        shard_ids = self.ranges[index]
+        env = {
+            **os.environ,
+            'BOT_SHARD_COUNT': str(self.shard_count),
+            'BOT_SHARD_PROCESSES': str(len(self.ranges)),
+            'BOT_SHARD_IDS': ",".join(map(str, shard_ids)),
+            'BOT_PROCESS_INDEX': str(index),
+        }
+        worker = subprocess.Popen([sys.executable, self.script], env=env)
+        self._started_at[index] = time.monotonic()
+        self.spawned += 1
+        log.info("Started worker %d (pid %d) for shards %d-%d", index, worker.pid, shard_ids[0], shard_ids[-1])
+        return worker
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def next_restart_delay(self, index: int) -> float:
+        """Counts a crash of worker `index` and returns the delay before restarting it, or None to give up."""
+        if time.monotonic() - self._started_at.get(index, 0.0) >= self.stable_after:
+            self._crashes[index] = 0
+        self._crashes[index] = crashes = self._crashes.get(index, 0) + 1
+        if crashes > self.max_restarts:
+            return None
+        return min(self.restart_delay * 2 ** (crashes - 1), self.max_restart_delay)
+
+    def run(self) -> int:
+        """Supervises the workers until stopped. Returns the exit code for the launcher process."""
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        if config.USER_STORE_BACKEND == 'sqlite':
+            # Done once here, so the workers don't race each other to import and rename the JSON file
+            migrate_legacy_stores()
+        log.info("Launching %d shards across %d processes", self.shard_count, len(self.ranges))
+        for index in range(len(self.ranges)):
+            self._workers[index] = self._spawn(index)
+
+        exit_code = 0
+        restart_at = {} # process index -> time a crashed worker is due to be restarted
+        while not self._stopping and self._workers:
+            time.sleep(self.poll_interval)
+            for index, worker in list(self._workers.items()):
+                if worker.poll() is None or index in restart_at:
+                    continue
+                if worker.returncode == 0:
+                    log.info("Worker %d stopped", index)
+                    del self._workers[index]
+                    continue
+                if worker.returncode == EXIT_FATAL:
+                    log.critical("Worker %d could not start (bad token or configuration); stopping all workers", index)
+                    exit_code = EXIT_FATAL
+                    self._stopping = True
+                    break
+                delay = self.next_restart_delay(index)
+                if delay is None:
+                    log.critical("Worker %d crashed %d times in a row; stopping all workers", index, self.max_restarts + 1)
+                    exit_code = 1
+                    self._stopping = True
+                    break
+                log.warning("Worker %d exited with code %s; restarting in %ss", index, worker.returncode, delay)
+                restart_at[index] = time.monotonic() + delay
+            for index, due in list(restart_at.items()):
+                if time.monotonic() >= due and not self._stopping:
+                    self._workers[index] = self._spawn(index)
+                    del restart_at[index]
+
+        log.info("Stopping workers...")
+        for worker in self._workers.values():
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGTERM)
+        for index, worker in self._workers.items():
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                log.warning("Worker %d did not stop in time; killing it", index)
+                worker.kill()
+        return exit_code
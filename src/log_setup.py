@@ -0,0 +1,88 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# Import config variables
+from src import config
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# --- Formatting (runs on the listener thread) ---
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, any `extra=` fields and the traceback."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+# --- Handlers and Filters (run on the calling thread) ---
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue untouched. The stock QueueHandler formats the message before enqueueing,
+    which would keep the formatting work on the event loop; here it all happens on the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through one in every `every` records per message template for a logger, below ERROR.
+    Used for lines that repeat per user, such as broadcast delivery failures.
+    """
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self._seen = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        seen = self._seen.get(record.msg, 0)
+        self._seen[record.msg] = seen + 1
+        if seen % self.every:
+            return False
+        if seen:
+            record.sampled_every = self.every
+        return True
+
+# --- Setup ---
+
+def configure_logging(level: str = config.LOG_LEVEL, levels: dict = config.LOG_LEVELS,
+                      sampling: dict = config.LOG_SAMPLING, json_output: bool = config.LOG_JSON) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a queue to a background listener thread that formats and writes to stdout.
+    Returns the started listener; call `stop()` on it at shutdown to flush what's left.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter() if json_output else logging.Formatter('%(asctime)s %(levelname)-8s %(name)s: %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+    for name, every in sampling.items():
+        if every > 1:
+            logging.getLogger(name).addFilter(SamplingFilter(every))
+
+    listener.start()
+    return listener
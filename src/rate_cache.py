@@ -0,0 +1,230 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import tempfile
+import time
+
+# Import config variables
+from src import config
+from src.http_client import HTTPClient, HTTPError
+
+log = logging.getLogger(__name__)
+
+# --- Helper Functions ---
+
+def next_publication_after(rate_date: str) -> float:
+    """
+    Returns the UNIX time at which a table dated `rate_date` is expected to be superseded,
+    i.e. the publication time on the next weekday after that date.
+    """
+    day = datetime.date.fromisoformat(rate_date) + datetime.timedelta(days=1)
+    while day.weekday() >= 5: # Reference rates are not published on weekends
+        day += datetime.timedelta(days=1)
+    published_at = datetime.datetime.combine(day, config.RATE_PUBLICATION_TIME_UTC, tzinfo=datetime.timezone.utc)
+    return published_at.timestamp()
+
+def validate_reference(data, default_base: str) -> dict:
+    """Checks a reference table payload and returns it as {'base', 'date', 'rates'}. Raises ValueError if it is malformed."""
+    if not isinstance(data, dict):
+        raise ValueError("rate payload is not an object")
+    base, date, rates = data.get('base', default_base), data.get('date'), data.get('rates')
+    if not isinstance(base, str) or not isinstance(date, str):
+        raise ValueError("rate payload has no valid base and date")
+    datetime.date.fromisoformat(date)
+    if not isinstance(rates, dict) or not rates:
+        raise ValueError("rate payload has no rates")
+    for code, rate in rates.items():
+        if not isinstance(code, str) or isinstance(rate, bool) or not isinstance(rate, (int, float)) or not rate > 0:
+            raise ValueError(f"invalid rate {code!r}: {rate!r}")
+    return {'base': base, 'date': date, 'rates': rates}
+
+def derive_table(reference: dict, base: str):
+    """Cross-derives the rate table for `base` from the reference (EUR) table. Returns None for unknown codes."""
+    reference_rates = dict(reference['rates'])
+    reference_rates[reference['base']] = 1.0
+    factor = reference_rates.get(base)
+    if not factor:
+        return None
+    rates = {code: rate / factor for code, rate in reference_rates.items() if code != base}
+    return {'amount': 1.0, 'base': base, 'date': reference['date'], 'rates': rates}
+
+# --- Rate Cache ---
+
+class RateCache:
+    """
+    In-process cache of exchange-rate tables keyed by base currency.
+    Only the reference (EUR) table is fetched from upstream, once per publication date;
+    every other base is cross-derived from it. Concurrent misses share one in-flight fetch.
+    """
+    def __init__(self, http_client: HTTPClient, api_url: str = config.BASE_CURRENCY_API_URL,
+                 reference_base: str = config.RATE_REFERENCE_BASE):
+        self.http_client = http_client
+        self.api_url = api_url
+        self.reference_base = reference_base
+        self._reference = None # The last reference table fetched from upstream
+        self._fetched_at = 0.0 # UNIX time that table came from upstream, kept across snapshots
+        self._from_snapshot = False # True until the table loaded from disk is replaced by a fetch
+        self._expires_at = 0.0
+        self.snapshot_saved_at = None # UNIX time the snapshot on disk was written, once one is loaded or saved
+        self._tables = {} # base -> derived table for the current reference date
+        self._inflight = {} # base -> Future of an upstream fetch in progress
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_fetches = 0
+        self.upstream_errors = 0
+
+    def _is_fresh(self) -> bool:
+        return self._reference is not None and time.time() < self._expires_at
+
+    def _store_reference(self, reference: dict, fetched_at: float = None):
+        now = time.time()
+        self._fetched_at = fetched_at or now
+        self._from_snapshot = fetched_at is not None
+        previous_date = self._reference['date'] if self._reference else None
+        expires_at = next_publication_after(reference['date'])
+        if expires_at <= now:
+            # Upstream hasn't published the next table yet (late run or holiday); check again soon.
+            expires_at = now + config.RATE_CACHE_RETRY_TTL
+        self._reference = reference
+        self._expires_at = max(expires_at, now + config.RATE_CACHE_MIN_TTL)
+        if reference['date'] != previous_date:
+            self._tables = {}
+
+    async def _fetch_reference(self) -> dict:
+        self.upstream_fetches += 1
+        data = await self.http_client.get_json(self.api_url, params={'base': self.reference_base})
+        try:
+            reference = validate_reference(data, self.reference_base)
+        except ValueError as e:
+            # Malformed tables are treated like a failed request, so callers keep serving the last good one
+            raise HTTPError(f"Unexpected rate payload from {self.api_url}: {e}") from e
+        self._store_reference(reference)
+        return reference
+
+    async def _refresh(self) -> dict:
+        """Fetches the reference table, collapsing concurrent callers into one request."""
+        inflight = self._inflight.get(self.reference_base)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[self.reference_base] = future
+        try:
+            reference = await self._fetch_reference()
+            future.set_result(reference)
+            return reference
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.upstream_errors += 1
+            future.set_exception(e)
+            future.exception() # Mark as retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[self.reference_base]
+
+    def is_cached(self) -> bool:
+        """True if a lookup would be answered without going upstream."""
+        return self._is_fresh()
+
+    def is_current(self) -> bool:
+        """True if the cached table is the latest published one, not a superseded one still being served."""
+        return self._reference is not None and time.time() < next_publication_after(self._reference['date'])
+
+    def refresh_due_in(self) -> float:
+        """Seconds until the cached table is due to be replaced; 0 if it already is."""
+        return max(0.0, self._expires_at - time.time())
+
+    async def prefetch(self, bases=config.RATE_PREFETCH_BASES) -> dict:
+        """Fetches the reference table now and derives the tables for `bases` ahead of any query."""
+        reference = await self._refresh()
+        for base in bases:
+            if base not in self._tables:
+                self._tables[base] = derive_table(reference, base)
+        return reference
+
+    # --- Snapshot ---
+    # The reference table is ~30 rates, so the snapshot is a small JSON file read once at startup.
+
+    def _read_snapshot(self, path: str):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_snapshot(self, path: str, snapshot: dict):
+        # A unique temp file per write, since every worker process refreshes and saves after the same publication
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.rate_snapshot-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(temp_path, path) # Atomic, so a crash mid-write never leaves a torn snapshot
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    async def load_snapshot(self, path: str = config.RATE_SNAPSHOT_FILE) -> bool:
+        """Seeds the cache from the snapshot on disk. A superseded table is still served until a refresh succeeds."""
+        try:
+            snapshot = await asyncio.to_thread(self._read_snapshot, path)
+            if snapshot is None:
+                return False
+            reference, fetched_at = validate_reference(snapshot['reference'], self.reference_base), float(snapshot['fetched_at'])
+            if self._reference is not None and self._reference['date'] >= reference['date']:
+                return False
+            self._store_reference(reference, fetched_at)
+            self.snapshot_saved_at = snapshot.get('saved_at', fetched_at)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring unreadable rate snapshot %s: %s", path, e)
+            return False
+        log.info("Loaded %s rates from snapshot (%.0fs old)", reference['date'], time.time() - fetched_at)
+        return True
+
+    async def save_snapshot(self, path: str = config.RATE_SNAPSHOT_FILE) -> bool:
+        if self._reference is None or self._from_snapshot:
+            return False
+        saved_at = time.time()
+        await asyncio.to_thread(self._write_snapshot, path, {'saved_at': saved_at, 'fetched_at': self._fetched_at, 'reference': self._reference})
+        self.snapshot_saved_at = saved_at
+        return True
+
+    async def get_rates(self, base: str):
+        """Returns the full rate table for `base` ({'base', 'date', 'rates'}), or None if unknown."""
+        base = base.upper()
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                await self._refresh()
+            except HTTPError:
+                if self._reference is None:
+                    raise
+                # Serve the stale table rather than nothing while upstream is failing.
+                self._expires_at = time.time() + config.RATE_CACHE_RETRY_TTL
+        if base not in self._tables:
+            self._tables[base] = derive_table(self._reference, base)
+        return self._tables[base]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'coalesced': self.coalesced,
+            'upstream_fetches': self.upstream_fetches,
+            'upstream_errors': self.upstream_errors,
+            'rate_date': self._reference['date'] if self._reference else None,
+            'expires_in': self.refresh_due_in() if self._reference else 0.0,
+            'table_age': time.time() - self._fetched_at if self._reference else 0.0,
+            'from_snapshot': self._from_snapshot,
+            'snapshot_age': time.time() - self.snapshot_saved_at if self.snapshot_saved_at else None,
+            'cached_bases': len(self._tables),
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import config variables
+from src import config
+from src.http_client import HTTPClient, HTTPError
+from src.rate_cache import next_publication_after
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_history (
+    base TEXT NOT NULL,
+    target TEXT NOT NULL,
+    day TEXT NOT NULL,
+    rate REAL NOT NULL,
+    PRIMARY KEY (base, target, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rate_history_coverage (
+    base TEXT NOT NULL,
+    target TEXT NOT NULL,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL,
+    PRIMARY KEY (base, target)
+) WITHOUT ROWID;
+"""
+
+def _day(date: datetime.date) -> str:
+    return date.isoformat()
+
+class RateHistoryStore:
+    """
+    Persistent SQLite store of daily rates per currency pair.
+    Only days that aren't stored yet are downloaded, and graph ranges are answered from disk.
+    All database work runs on a single background thread, off the event loop.
+    """
+    def __init__(self, http_client: HTTPClient, path: str = config.RATE_HISTORY_DB_FILE,
+                 api_url: str = config.HISTORY_CURRENCY_API_URL):
+        self.http_client = http_client
+        self.path = path
+        self.api_url = api_url
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-history')
+        self._conn = None
+        self._locks = {} # (base, target) -> Lock, so one pair is only filled once at a time
+        self._checked_at = {} # (base, target) -> UNIX time the tail was last brought up to date
+        self.upstream_fetches = 0
+
+    # --- Database helpers (run on the store thread) ---
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _get_coverage(self, base: str, target: str):
+        row = self._connect().execute(
+            "SELECT first_day, last_day FROM rate_history_coverage WHERE base = ? AND target = ?", (base, target)
+        ).fetchone()
+        return row
+
+    def _append(self, base: str, target: str, rates: dict, first_day: str, last_day: str):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_history (base, target, day, rate) VALUES (?, ?, ?, ?)",
+                [(base, target, day, rate) for day, rate in rates.items()],
+            )
+            conn.execute(
+                "INSERT INTO rate_history_coverage (base, target, first_day, last_day) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (base, target) DO UPDATE SET "
+                "first_day = min(first_day, excluded.first_day), last_day = max(last_day, excluded.last_day)",
+                (base, target, first_day, last_day),
+            )
+
+    def _query(self, base: str, target: str, start_day: str, end_day: str):
+        rows = self._connect().execute(
+            "SELECT day, rate FROM rate_history WHERE base = ? AND target = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (base, target, start_day, end_day),
+        ).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # --- Upstream ---
+
+    async def _download(self, base: str, target: str, start: datetime.date, end: datetime.date) -> dict:
+        """Downloads {day: rate} for the inclusive range from the time-series API."""
+        self.upstream_fetches += 1
+        url = f"{self.api_url}{_day(start)}..{_day(end)}"
+        data = await self.http_client.get_json(url, params={'base': base, 'symbols': target})
+        if not data or 'rates' not in data:
+            raise HTTPError(f"Unexpected history payload from {url}")
+        return {
+            day: day_rates[target]
+            for day, day_rates in data['rates'].items()
+            if target in day_rates and _day(start) <= day <= _day(end)
+        }
+
+    async def _fill(self, base: str, target: str, start: datetime.date, end: datetime.date):
+        """Downloads a missing range and records it as covered."""
+        if start > end:
+            return
+        rates = await self._download(base, target, start, end)
+        # The tail is only covered up to the latest published day, so a later call picks up new days.
+        last_day = max(rates) if rates else _day(start - datetime.timedelta(days=1))
+        await self._run(self._append, base, target, rates, _day(start), last_day)
+
+    async def ensure_range(self, base: str, target: str, start: datetime.date, end: datetime.date):
+        """Makes sure every published day in [start, end] is stored, downloading only what's missing."""
+        key = (base, target)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            coverage = await self._run(self._get_coverage, base, target)
+            if coverage is None:
+                await self._fill(base, target, start, end)
+                self._checked_at[key] = time.time()
+                return
+
+            first_day = datetime.date.fromisoformat(coverage[0])
+            last_day = datetime.date.fromisoformat(coverage[1])
+            if start < first_day:
+                await self._fill(base, target, start, first_day - datetime.timedelta(days=1))
+            # Skip the tail until a newer table can have been published since the last check
+            tail_due = time.time() >= next_publication_after(coverage[1])
+            recently_checked = time.time() - self._checked_at.get(key, 0) < config.RATE_CACHE_RETRY_TTL
+            if end > last_day and tail_due and not recently_checked:
+                self._checked_at[key] = time.time()
+                try:
+                    await self._fill(base, target, last_day + datetime.timedelta(days=1), end)
+                except HTTPError as e:
+                    # Stored days are still good enough to draw; the tail is retried later.
+                    log.warning("Could not extend rate history for %s/%s: %s", base, target, e)
+
+    async def get_series(self, base: str, target: str, num_days: int):
+        """Returns (dates, rates) for the last `num_days` days, filling the store incrementally first."""
+        base, target = base.upper(), target.upper()
+        end = datetime.datetime.now(datetime.timezone.utc).date()
+        start = end - datetime.timedelta(days=num_days)
+        await self.ensure_range(base, target, start, end)
+        return await self._run(self._query, base, target, _day(start), _day(end))
+
+    def close(self):
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=False)
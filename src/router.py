@@ -0,0 +1,83 @@
+import logging
+import discord
+from discord.ext import commands
+
+# Import config variables
+from src import config
+from src.instrumentation import registry
+
+log = logging.getLogger(__name__)
+
+# Routes a message can be classified into
+ROUTE_IGNORED = 'ignored'
+ROUTE_DM = 'dm'
+ROUTE_COMMAND = 'command'
+ROUTE_SHORTHAND = 'shorthand'
+ROUTE_MENTION = 'mention'
+
+class MessageRouter:
+    """
+    Classifies every incoming message exactly once and hands it to a single handler:
+    a registered command, the mention handler (AI chat) or the prefix shorthand handler (currency).
+    Messages that are neither prefixed nor mention the bot are dropped before any parsing.
+    Cogs plug in by setting `mention_handler` / `shorthand_handler` to an async callable taking the message.
+    """
+    def __init__(self, bot: commands.Bot, prefix: str = config.COMMAND_PREFIX):
+        self.bot = bot
+        self.prefix = prefix
+        self.prefix_length = len(prefix)
+        self.mention_handler = None
+        self.shorthand_handler = None
+        self.counts = {route: 0 for route in (ROUTE_IGNORED, ROUTE_DM, ROUTE_COMMAND, ROUTE_SHORTHAND, ROUTE_MENTION)}
+
+    def classify(self, message: discord.Message) -> str:
+        # Other bots (including ourselves) are never answered
+        if message.author.bot:
+            return ROUTE_IGNORED
+        if message.guild is None:
+            return ROUTE_DM
+
+        content = message.content
+        # Fast path: most traffic is neither prefixed nor aimed at the bot
+        if not content.startswith(self.prefix):
+            return ROUTE_MENTION if self._mentions_bot(message) else ROUTE_IGNORED
+
+        invoker = content[self.prefix_length:].split(None, 1)
+        if invoker and invoker[0] in self.bot.all_commands:
+            return ROUTE_COMMAND
+        # A prefixed message that mentions the bot, e.g. "!hey @bot what is...", is for AI chat, not shorthand
+        if self._mentions_bot(message):
+            return ROUTE_MENTION
+        return ROUTE_SHORTHAND if invoker else ROUTE_IGNORED
+
+    def _mentions_bot(self, message: discord.Message) -> bool:
+        return bool(message.mentions or message.mention_everyone) and self.bot.user.mentioned_in(message)
+
+    async def route(self, message: discord.Message):
+        route = self.classify(message)
+        self.counts[route] += 1
+        if route == ROUTE_IGNORED:
+            return
+
+        with registry.time('message', route):
+            await self._dispatch(route, message)
+
+    async def _dispatch(self, route: str, message: discord.Message):
+        if route == ROUTE_COMMAND:
+            ctx = await self.bot.get_context(message)
+            await self.bot.invoke(ctx)
+        elif route == ROUTE_SHORTHAND:
+            if self.shorthand_handler:
+                await self.shorthand_handler(message)
+        elif route == ROUTE_MENTION:
+            if self.mention_handler:
+                await self.mention_handler(message)
+        elif route == ROUTE_DM:
+            try:
+                await message.channel.send("Sorry, I only operate in server channels. Please interact with me there!")
+            except discord.errors.Forbidden:
+                # This can happen if the user has DMs disabled for non-friends.
+                log.info("Could not send DM reply to %s", message.author.name)
+
+    def stats(self) -> dict:
+        return {f'routed_{route}': count for route, count in self.counts.items()}
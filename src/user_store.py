@@ -0,0 +1,339 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Import config variables
+from src import config
+
+log = logging.getLogger(__name__)
+
+# --- Storage Backends ---
+# Backends are plain synchronous classes; AsyncUserStore runs them off the event loop.
+# Keys are Discord user ids as strings; values are zodiac sign names, or delivery times for that collection.
+
+class UserStore(ABC):
+    """Interface for horoscope registration storage."""
+    @abstractmethod
+    def get(self, user_id: str):
+        ...
+
+    @abstractmethod
+    def set(self, user_id: str, sign: str):
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: str) -> bool:
+        """Removes a registration. Returns False if there was none."""
+
+    @abstractmethod
+    def all(self) -> dict:
+        ...
+
+    def count(self) -> int:
+        return len(self.all())
+
+    def apply_changes(self, changes: dict):
+        """Writes a batch of {user_id: sign}, where a sign of None means the registration was removed."""
+        for user_id, sign in changes.items():
+            if sign is None:
+                self.delete(user_id)
+            else:
+                self.set(user_id, sign)
+
+    def close(self):
+        pass
+
+class JSONUserStore(UserStore):
+    """The original storage: one JSON file, read and rewritten in full on every change."""
+    def __init__(self, path: str = config.USER_DATA_FILE):
+        self.path = path
+
+    def all(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+
+    def _save(self, data: dict):
+        # Write to a temporary file and rename it over the old one, so a crash never leaves a half-written file.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def get(self, user_id: str):
+        return self.all().get(user_id)
+
+    def set(self, user_id: str, sign: str):
+        data = self.all()
+        data[user_id] = sign
+        self._save(data)
+
+    def delete(self, user_id: str) -> bool:
+        data = self.all()
+        if user_id not in data:
+            return False
+        del data[user_id]
+        self._save(data)
+        return True
+
+    def apply_changes(self, changes: dict):
+        # One read and one write for the whole batch
+        data = self.all()
+        for user_id, sign in changes.items():
+            if sign is None:
+                data.pop(user_id, None)
+            else:
+                data[user_id] = sign
+        self._save(data)
+
+class SQLiteUserStore(UserStore):
+    """
+    SQLite storage in WAL mode; every change is a single-row upsert or delete keyed by user id.
+    Each collection (registrations, delivery times) is its own two-column table in the same database.
+    """
+    def __init__(self, path: str = config.USER_DB_FILE, legacy_json_path: str = config.USER_DATA_FILE,
+                 table: str = 'horoscope_users', value_column: str = 'sign'):
+        self.path = path
+        self.table = table
+        self.value_column = value_column
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (user_id TEXT PRIMARY KEY, {value_column} TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        if legacy_json_path:
+            self.migrate_from_json(legacy_json_path)
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        One-time import of the old JSON file. Rows already in the database win,
+        and the file is renamed afterwards so it is never imported twice.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        users = JSONUserStore(json_path).all()
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (user_id, {self.value_column}) VALUES (?, ?)", list(users.items())
+            )
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except FileNotFoundError:
+            # Another process sharing the database imported and renamed it first; the rows were ignored as duplicates
+            return 0
+        log.info("Migrated %d horoscope registrations from %s to %s", len(users), json_path, self.path)
+        return len(users)
+
+    def get(self, user_id: str):
+        row = self._conn.execute(f"SELECT {self.value_column} FROM {self.table} WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, user_id: str, sign: str):
+        with self._conn:
+            self._conn.execute(
+                f"INSERT INTO {self.table} (user_id, {self.value_column}) VALUES (?, ?) "
+                f"ON CONFLICT (user_id) DO UPDATE SET {self.value_column} = excluded.{self.value_column}",
+                (user_id, sign),
+            )
+
+    def delete(self, user_id: str) -> bool:
+        with self._conn:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+
+    def apply_changes(self, changes: dict):
+        # The whole batch is one transaction
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (user_id, {self.value_column}) VALUES (?, ?) "
+                f"ON CONFLICT (user_id) DO UPDATE SET {self.value_column} = excluded.{self.value_column}",
+                [(user_id, sign) for user_id, sign in changes.items() if sign is not None],
+            )
+            self._conn.executemany(
+                f"DELETE FROM {self.table} WHERE user_id = ?",
+                [(user_id,) for user_id, sign in changes.items() if sign is None],
+            )
+
+    def all(self) -> dict:
+        return dict(self._conn.execute(f"SELECT user_id, {self.value_column} FROM {self.table}").fetchall())
+
+    def count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+# --- Async Access ---
+
+class AsyncUserStore:
+    """
+    Async front for a UserStore. Every call runs on one dedicated thread, which keeps
+    file and database I/O off the event loop and serialises access to the backend.
+    """
+    def __init__(self, backend: UserStore, executor: ThreadPoolExecutor = None):
+        self.backend = backend
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-store')
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get(self, user_id: str):
+        return await self._run(self.backend.get, user_id)
+
+    async def set(self, user_id: str, sign: str):
+        await self._run(self.backend.set, user_id, sign)
+
+    async def delete(self, user_id: str) -> bool:
+        return await self._run(self.backend.delete, user_id)
+
+    async def all(self) -> dict:
+        return await self._run(self.backend.all)
+
+    async def count(self) -> int:
+        return await self._run(self.backend.count)
+
+    async def apply_changes(self, changes: dict):
+        await self._run(self.backend.apply_changes, changes)
+
+    async def close(self):
+        await self._run(self.backend.close)
+        self._executor.shutdown(wait=False)
+
+class CachedUserStore:
+    """
+    Write-behind cache in front of an AsyncUserStore. The registrations are loaded once and served
+    from memory; changes are collected and written in one batch after a short delay, so a burst of
+    registrations costs a single write. Call `flush` or `close` to write pending changes immediately.
+    """
+    def __init__(self, store: AsyncUserStore, flush_delay: float = config.USER_STORE_FLUSH_DELAY):
+        self.store = store
+        self.flush_delay = flush_delay
+        self._users = {}
+        self._pending = {} # user_id -> sign, or None for a removal
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+
+    async def load(self):
+        self._users = await self.store.all()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            log.warning("Failed to save horoscope registrations, retrying: %s", e)
+            # This task is still running, so clear it or _schedule_flush would see a flush in progress
+            self._flush_task = None
+            self._schedule_flush()
+
+    async def flush(self):
+        """Writes all pending changes in one batch."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            changes, self._pending = self._pending, {}
+            try:
+                await self.store.apply_changes(changes)
+                self.flushes += 1
+            except Exception:
+                # Put the batch back without overwriting anything changed in the meantime
+                self._pending = {**changes, **self._pending}
+                raise
+
+    async def get(self, user_id: str):
+        return self._users.get(user_id)
+
+    async def set(self, user_id: str, sign: str):
+        self._users[user_id] = sign
+        self._pending[user_id] = sign
+        self._schedule_flush()
+
+    async def delete(self, user_id: str) -> bool:
+        if user_id not in self._users:
+            return False
+        del self._users[user_id]
+        self._pending[user_id] = None
+        self._schedule_flush()
+        return True
+
+    async def all(self) -> dict:
+        return dict(self._users)
+
+    async def count(self) -> int:
+        return len(self._users)
+
+    @property
+    def pending_changes(self) -> int:
+        return len(self._pending)
+
+    async def close(self):
+        """Flushes anything pending and closes the backend."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        await self.store.close()
+
+BACKENDS = {
+    'json': JSONUserStore,
+    'sqlite': SQLiteUserStore,
+}
+
+# Keyed collections that can be opened: name -> (JSON file, SQLite table, value column, JSON file to import into SQLite)
+COLLECTIONS = {
+    'registrations': (config.USER_DATA_FILE, 'horoscope_users', 'sign', config.USER_DATA_FILE),
+    'delivery_times': (config.DELIVERY_DATA_FILE, 'horoscope_delivery_times', 'delivery_time', None),
+}
+
+def _create_backend(backend: str, collection: str) -> UserStore:
+    json_path, table, value_column, legacy_json_path = COLLECTIONS[collection]
+    if backend == 'json':
+        return JSONUserStore(json_path)
+    # Sharded workers share one database; the launcher (or the leader) does the one-time import
+    if not config.IS_LEADER_PROCESS:
+        legacy_json_path = None
+    return SQLiteUserStore(legacy_json_path=legacy_json_path, table=table, value_column=value_column)
+
+def migrate_legacy_stores():
+    """Creates every SQLite collection and imports the legacy JSON files, before any worker process opens them."""
+    for _, table, value_column, legacy_json_path in COLLECTIONS.values():
+        SQLiteUserStore(legacy_json_path=legacy_json_path, table=table, value_column=value_column).close()
+
+async def open_user_store(backend: str = config.USER_STORE_BACKEND, shared: bool = config.SHARD_PROCESSES > 1,
+                          collection: str = 'registrations'):
+    """
+    Opens a collection ('registrations' or 'delivery_times') in the configured backend ('sqlite' or 'json'),
+    behind the async front and the write-behind cache.
+    The backend is created on the store thread too, so any migration happens off the loop.
+    With `shared` (several bot processes on one database) the cache is skipped, so every process
+    reads the others' registrations straight from SQLite.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown USER_STORE_BACKEND: {backend!r}")
+    if shared and backend != 'sqlite':
+        raise ValueError("Several bot processes can only share the 'sqlite' USER_STORE_BACKEND")
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-store')
+    loop = asyncio.get_running_loop()
+    store = await loop.run_in_executor(executor, _create_backend, backend, collection)
+    if shared:
+        return AsyncUserStore(store, executor)
+    cached_store = CachedUserStore(AsyncUserStore(store, executor))
+    await cached_store.load()
+    return cached_store
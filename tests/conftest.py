@@ -0,0 +1,6 @@
+import os
+import sys
+
+# src.config exits without a token, and the tests import it through every module
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
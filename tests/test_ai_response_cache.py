@@ -0,0 +1,73 @@
+import asyncio
+
+from src.ai_response_cache import ResponseCache, normalize_prompt
+
+def answer(text: str, delay: float = 0.0):
+    calls = []
+    async def generate():
+        calls.append(text)
+        await asyncio.sleep(delay)
+        return text
+    return generate, calls
+
+def test_normalize_prompt():
+    assert normalize_prompt("  What   is  Python?!  ") == "what is python"
+
+def test_trivially_different_prompts_hit():
+    async def run():
+        cache = ResponseCache(similarity_threshold=0)
+        generate, calls = answer("A language.")
+        first = await cache.get_or_generate("What is Python?", generate)
+        second = await cache.get_or_generate("what is python", generate)
+        return cache, first, second, calls
+
+    cache, first, second, calls = asyncio.run(run())
+    assert first == ("A language.", False)
+    assert second == ("A language.", True)
+    assert calls == ["A language."]
+    assert cache.exact_hits == 1
+
+def test_similar_prompt_hits_when_enabled():
+    async def run():
+        cache = ResponseCache(similarity_threshold=0.8)
+        generate, calls = answer("Paris.")
+        await cache.get_or_generate("what is the capital city of france", generate)
+        return cache, await cache.get_or_generate("what is the capital city of france today", generate), calls
+
+    cache, result, calls = asyncio.run(run())
+    assert result == ("Paris.", True)
+    assert len(calls) == 1 and cache.similar_hits == 1
+
+def test_concurrent_identical_prompts_share_one_generation():
+    async def run():
+        cache = ResponseCache()
+        generate, calls = answer("Shared.", delay=0.01)
+        results = await asyncio.gather(*(cache.get_or_generate("same prompt", generate) for _ in range(5)))
+        return cache, results, calls
+
+    cache, results, calls = asyncio.run(run())
+    assert calls == ["Shared."]
+    assert cache.deduplicated == 4
+    assert sorted(cached for _, cached in results) == [False, True, True, True, True]
+
+def test_expired_entries_are_regenerated():
+    async def run():
+        cache = ResponseCache(ttl=0, similarity_threshold=0)
+        generate, calls = answer("Again.")
+        await cache.get_or_generate("prompt", generate)
+        await asyncio.sleep(0.001)
+        await cache.get_or_generate("prompt", generate)
+        return calls
+
+    assert len(asyncio.run(run())) == 2
+
+def test_least_recently_used_entries_are_evicted_under_the_byte_cap():
+    async def run():
+        cache = ResponseCache(max_bytes=10, similarity_threshold=0)
+        for prompt in ("one", "two", "three"):
+            await cache.get_or_generate(prompt, answer("abcd")[0])
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.bytes == 8
+    assert list(cache._entries) == ["two", "three"]
@@ -0,0 +1,26 @@
+from src.ai_stream import split_pages
+
+def test_short_text_is_one_page():
+    assert split_pages("hello", limit=10) == ["hello"]
+    assert split_pages("", limit=10) == [""]
+
+def test_prefers_newline_then_space():
+    assert split_pages("aaaa bbbb\ncccc dddd", limit=12) == ["aaaa bbbb", "cccc dddd"]
+    assert split_pages("aaaa bbbb cccc", limit=10) == ["aaaa bbbb", "cccc"]
+
+def test_hard_cut_without_whitespace():
+    assert split_pages("x" * 25, limit=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+def test_pages_respect_the_limit():
+    text = " ".join(f"word{index}" for index in range(2000))
+    pages = split_pages(text, limit=2000)
+    assert all(len(page) <= 2000 for page in pages)
+    assert " ".join(pages) == text
+
+def test_appending_never_moves_earlier_breaks():
+    text = " ".join(f"token{index}" for index in range(600))
+    previous = split_pages(text[:100], limit=50)
+    for end in range(101, len(text), 37):
+        pages = split_pages(text[:end], limit=50)
+        assert pages[:len(previous) - 1] == previous[:-1]
+        previous = pages
@@ -0,0 +1,50 @@
+import pytest
+
+from src.currency_grammar import CurrencyIndex, parse_conversion
+
+@pytest.fixture
+def index() -> CurrencyIndex:
+    return CurrencyIndex(codes=("USD", "MYR", "SGD", "EUR", "JPY", "CNY", "UAH"), aliases={"RMB": "CNY", "RM": "MYR", "BTC": "XBT"})
+
+def test_resolve_codes_and_aliases(index):
+    assert index.resolve("usd") == "USD"
+    assert index.resolve("rmb") == "CNY"
+    assert index.resolve("btc") is None # Alias for a code the index doesn't know
+    assert index.resolve("lol") is None
+
+def test_update_replaces_codes(index):
+    index.update(["USD", "GBP"])
+    assert index.resolve("gbp") == "GBP"
+    assert index.resolve("myr") is None
+    assert index.resolve("rm") is None
+    assert len(index) == 2
+
+def test_suggest_by_longest_prefix(index):
+    assert index.suggest("usx") == ["USD"]
+    assert index.suggest("u") == ["UAH", "USD"]
+    assert index.suggest("e", limit=1) == ["EUR"]
+    assert index.suggest("zzz") == []
+
+@pytest.mark.parametrize('text, base, amount, targets', [
+    ("usd", "USD", 1.0, []),
+    ("usd100 myr", "USD", 100.0, ["MYR"]),
+    ("USD2.5 myr", "USD", 2.5, ["MYR"]),
+    ("usd 100 myr sgd", "USD", 100.0, ["MYR", "SGD"]),
+    ("rm50 usd myr usd", "MYR", 50.0, ["USD", "MYR"]),
+])
+def test_parse_conversion(index, text, base, amount, targets):
+    query = parse_conversion(text, index)
+    assert (query.base, query.amount, query.targets, query.unknown_targets) == (base, amount, targets, [])
+
+@pytest.mark.parametrize('text', ["", "lol", "usd.", "123", "usd-5"])
+def test_non_currency_text_is_rejected(index, text):
+    assert parse_conversion(text, index) is None
+
+def test_unknown_targets_are_reported(index):
+    query = parse_conversion("usd myr xyz", index)
+    assert query.targets == ["MYR"]
+    assert query.unknown_targets == ["XYZ"]
+
+def test_targets_are_capped(index):
+    query = parse_conversion("usd myr sgd eur jpy", index, max_targets=2)
+    assert query.targets == ["MYR", "SGD"]
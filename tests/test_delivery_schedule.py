@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+import sqlite3
+import time
+
+import pytest
+
+from src import delivery_schedule
+from src.delivery_schedule import DeliveryScheduler, DeliveryWheel, local_date, parse_delivery_time, utc_minute
+
+@pytest.mark.parametrize('text, expected', [
+    ("7:30", "07:30 UTC"),
+    ("07:30 utc", "07:30 UTC"),
+    ("07:30 +8", "07:30 +08:00"),
+    ("07:30 UTC-05:30", "07:30 -05:30"),
+    ("07:30 Europe/London", "07:30 Europe/London"),
+])
+def test_parse_delivery_time(text, expected):
+    assert parse_delivery_time(text) == expected
+
+@pytest.mark.parametrize('text', ["", "24:00", "07:60", "7", "07:30 Mars/Olympus", "07:30 +15", "07:30 UTC extra"])
+def test_parse_delivery_time_rejects(text):
+    assert parse_delivery_time(text) is None
+
+def test_utc_minute_fixed_offsets():
+    day = datetime.date(2024, 1, 15)
+    assert utc_minute("07:30 UTC", day) == 7 * 60 + 30
+    assert utc_minute("07:30 +08:00", day) == 23 * 60 + 30 # 23:30 the previous UTC day
+    assert utc_minute("22:00 -05:00", day) == 3 * 60
+
+def test_utc_minute_follows_daylight_saving():
+    assert utc_minute("09:00 Europe/London", datetime.date(2024, 1, 15)) == 9 * 60
+    assert utc_minute("09:00 Europe/London", datetime.date(2024, 7, 15)) == 8 * 60
+
+def test_utc_minute_on_transition_days():
+    # London skips 01:00-02:00 on 2024-03-31; a time in the gap uses the offset from before the jump
+    assert utc_minute("01:30 Europe/London", datetime.date(2024, 3, 31)) == 1 * 60 + 30
+    assert utc_minute("09:00 Europe/London", datetime.date(2024, 3, 31)) == 8 * 60
+    # New York repeats 01:00-02:00 on 2024-11-03; the first (daylight) occurrence is used
+    assert utc_minute("01:30 America/New_York", datetime.date(2024, 11, 3)) == 5 * 60 + 30
+    assert utc_minute("09:00 America/New_York", datetime.date(2024, 11, 3)) == 14 * 60
+
+def test_utc_minute_rejects_unknown_zone():
+    with pytest.raises(ValueError):
+        utc_minute("07:30 Mars/Olympus", datetime.date(2024, 1, 15))
+
+def test_local_date_east_and_west_of_utc():
+    at = datetime.datetime(2024, 1, 15, 23, 30, tzinfo=datetime.timezone.utc)
+    assert local_date("07:30 +08:00", at) == datetime.date(2024, 1, 16)
+    assert local_date("07:30 Asia/Kuala_Lumpur", at) == datetime.date(2024, 1, 16)
+    assert local_date("07:30 UTC", at) == datetime.date(2024, 1, 15)
+    early = datetime.datetime(2024, 1, 15, 2, 0, tzinfo=datetime.timezone.utc)
+    assert local_date("21:00 America/New_York", early) == datetime.date(2024, 1, 14)
+
+def test_wheel_moves_and_removes_users():
+    wheel = DeliveryWheel()
+    wheel.place("1", 10)
+    wheel.place("2", 10)
+    wheel.place("1", 20)
+    assert wheel.slot(10) == {"2"}
+    assert wheel.slot(20) == {"1"}
+    assert wheel.minute_of("1") == 20
+    assert len(wheel) == 2
+    assert wheel.remove("1") and not wheel.remove("1")
+    assert wheel.slot(20) == set()
+    wheel.clear()
+    assert len(wheel) == 0 and wheel.slot(10) == set()
+
+def make_scheduler(load=None, deliver=None) -> DeliveryScheduler:
+    async def no_delivery(user_ids, due):
+        return {}
+    async def nobody():
+        return {}, {}
+    return DeliveryScheduler(deliver or no_delivery, load or nobody, default_time=None, reload_every=3600)
+
+def test_users_without_a_time_are_spread_over_the_day():
+    scheduler = make_scheduler()
+    scheduler.add("1441")
+    assert scheduler.wheel.minute_of("1441") == 1
+    scheduler.add("1441", "00:05 UTC")
+    assert scheduler.wheel.minute_of("1441") == 5
+    scheduler.clear_time("1441")
+    assert scheduler.wheel.minute_of("1441") == 1
+
+def test_unresolvable_stored_time_falls_back_to_the_spread_minute():
+    async def load():
+        return {"1441": "Leo", "7": "Virgo"}, {"1441": "07:00 Mars/Olympus", "7": "00:10 UTC"}
+
+    scheduler = make_scheduler(load=load)
+    asyncio.run(scheduler.reload())
+    assert scheduler.wheel.minute_of("1441") == 1
+    assert scheduler.wheel.minute_of("7") == 10
+
+def test_scheduler_local_date_falls_back_to_utc():
+    scheduler = make_scheduler()
+    scheduler.add("1", "07:30 +08:00")
+    scheduler.add("2")
+    scheduler.add("3", "07:00 Mars/Olympus")
+    at = datetime.datetime(2024, 1, 15, 23, 30, tzinfo=datetime.timezone.utc)
+    assert scheduler.local_date("1", at) == datetime.date(2024, 1, 16)
+    assert scheduler.local_date("2", at) == datetime.date(2024, 1, 15)
+    assert scheduler.local_date("3", at) == datetime.date(2024, 1, 15)
+
+def test_due_bucket_is_delivered_once():
+    delivered = []
+    async def deliver(user_ids, due):
+        assert (due.hour, due.minute) == (0, 5)
+        delivered.append(user_ids)
+        return {'sent': len(user_ids)}
+
+    async def run():
+        scheduler = make_scheduler(deliver=deliver)
+        scheduler.add("1", "00:05 UTC")
+        scheduler.add("2", "00:05 UTC")
+        scheduler._cursor = 0
+        scheduler._loaded_at = time.monotonic() # Not due for a reload, which would replace the wheel
+        now = datetime.datetime.combine(scheduler._day, datetime.time(0, 6), tzinfo=datetime.timezone.utc)
+        await scheduler._tick(now)
+        await scheduler._tick(now)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert delivered == [["1", "2"]]
+    assert scheduler.users_delivered == 2 and scheduler.recent_buckets[-1][3] == 2
+
+def test_next_bucket_is_handed_to_prefetch():
+    prefetched = []
+    async def prefetch(user_ids, due):
+        prefetched.append((user_ids, due))
+
+    async def run():
+        scheduler = make_scheduler()
+        scheduler.prefetch = prefetch
+        scheduler.add("1", "00:07 UTC")
+        scheduler.add("2", "00:07 UTC")
+        scheduler.add("3", "00:09 UTC")
+        scheduler._cursor = 0
+        scheduler._loaded_at = time.monotonic()
+        for minute in (6, 7):
+            await scheduler._tick(datetime.datetime.combine(scheduler._day, datetime.time(0, minute, 30), tzinfo=datetime.timezone.utc))
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    due = datetime.datetime.combine(scheduler._day, datetime.time(0, 7), tzinfo=datetime.timezone.utc)
+    assert prefetched == [(["1", "2"], due)] # Nobody is due at 00:08
+
+def test_a_failing_tick_does_not_stop_the_scheduler(monkeypatch):
+    attempts = []
+    async def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return {"1": "Leo"}, {}
+
+    sleeps = []
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(delivery_schedule.asyncio, 'sleep', fake_sleep)
+    scheduler = make_scheduler(load=load)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(scheduler._run())
+    assert len(attempts) == 2
+    assert len(scheduler.wheel) == 1
+    assert scheduler._cursor is not None
@@ -0,0 +1,134 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from src import horoscope_cache
+from src.cogs.horoscope import HoroscopeCog
+from src.delivery_schedule import DeliveryScheduler
+from src.horoscope_cache import ZODIAC_SIGNS, HoroscopeCache
+
+class FakeHTTPClient:
+    """Answers with a horoscope for the requested sign and day after `delay` seconds."""
+    def __init__(self, delay: float = 0.0, failing: tuple = ()):
+        self.delay = delay
+        self.failing = failing
+        self.requests = []
+
+    async def get_json(self, url, params=None):
+        self.requests.append(dict(params))
+        await asyncio.sleep(self.delay)
+        if params['sign'] in self.failing:
+            raise OSError("connection reset")
+        return {'success': True, 'data': {'date': params['day'], 'horoscope_data': f"{params['sign']} on {params['day']}"}}
+
+def set_today(monkeypatch, day: datetime.date):
+    monkeypatch.setattr(horoscope_cache, '_today', lambda: day)
+
+def test_requests_the_given_date_and_caches_per_date(monkeypatch):
+    set_today(monkeypatch, datetime.date(2024, 1, 15))
+    client = FakeHTTPClient()
+    cache = HoroscopeCache(client, api_url='http://stub')
+
+    async def run():
+        tomorrow = await cache.get('leo', datetime.date(2024, 1, 16))
+        today = await cache.get('Leo')
+        again = await cache.get('Leo', datetime.date(2024, 1, 16))
+        return tomorrow, today, again
+
+    tomorrow, today, again = asyncio.run(run())
+    assert client.requests == [{'sign': 'Leo', 'day': '2024-01-16'}, {'sign': 'Leo', 'day': '2024-01-15'}]
+    assert tomorrow['date'] == '2024-01-16' and today['date'] == '2024-01-15'
+    assert again is tomorrow and cache.hits == 1
+    assert cache.is_cached('leo') and cache.is_cached('Leo', datetime.date(2024, 1, 16))
+    assert not cache.is_cached('Leo', datetime.date(2024, 1, 14))
+
+def test_concurrent_misses_share_one_request(monkeypatch):
+    set_today(monkeypatch, datetime.date(2024, 1, 15))
+    client = FakeHTTPClient(delay=0.01)
+    cache = HoroscopeCache(client, api_url='http://stub')
+
+    async def run():
+        return await asyncio.gather(*(cache.get('Leo') for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(client.requests) == 1 and all(result is results[0] for result in results)
+
+def test_prefetch_all_fetches_every_sign_for_a_date(monkeypatch):
+    set_today(monkeypatch, datetime.date(2024, 1, 15))
+    client = FakeHTTPClient(failing=('Leo',))
+    cache = HoroscopeCache(client, api_url='http://stub')
+    tomorrow = datetime.date(2024, 1, 16)
+
+    assert asyncio.run(cache.prefetch_all(tomorrow)) == 11
+    assert sorted(request['sign'] for request in client.requests) == sorted(ZODIAC_SIGNS)
+    assert {request['day'] for request in client.requests} == {'2024-01-16'}
+    assert cache.cached_signs(tomorrow) == 11 and cache.cached_signs() == 0
+
+def test_dates_more_than_a_day_behind_utc_expire(monkeypatch):
+    set_today(monkeypatch, datetime.date(2024, 1, 15))
+    cache = HoroscopeCache(FakeHTTPClient(), api_url='http://stub')
+    for day in (14, 15, 16):
+        asyncio.run(cache.get('Leo', datetime.date(2024, 1, day)))
+
+    set_today(monkeypatch, datetime.date(2024, 1, 16))
+    assert not cache.is_cached('Leo', datetime.date(2024, 1, 14))
+    assert cache.is_cached('Leo', datetime.date(2024, 1, 15))
+    assert cache.is_cached('Leo', datetime.date(2024, 1, 16))
+
+def test_deliver_bucket_sends_each_user_their_local_date():
+    async def no_delivery(user_ids, due):
+        return {}
+    async def nobody():
+        return {}, {}
+
+    scheduler = DeliveryScheduler(no_delivery, nobody, default_time=None)
+    scheduler.add("1", "07:30 +08:00")
+    scheduler.add("2", "23:30 UTC")
+    scheduler.add("3", "18:30 America/New_York")
+    signs = {"1": "Leo", "2": "Virgo", "3": "Aries"}
+
+    async def get(user_id):
+        return signs.get(user_id)
+
+    broadcasts = []
+    async def broadcast(users):
+        broadcasts.append(users)
+        return {'sent': len(users)}
+
+    cog = SimpleNamespace(user_store=SimpleNamespace(get=get), scheduler=scheduler, broadcast=broadcast)
+    due = datetime.datetime(2024, 1, 15, 23, 30, tzinfo=datetime.timezone.utc)
+    stats = asyncio.run(HoroscopeCog.deliver_bucket(cog, ["1", "2", "3", "4"], due))
+    assert stats == {'sent': 3}
+    assert broadcasts == [{
+        "1": ("Leo", datetime.date(2024, 1, 16)),
+        "2": ("Virgo", datetime.date(2024, 1, 15)),
+        "3": ("Aries", datetime.date(2024, 1, 15)),
+    }]
+
+def test_prefetch_bucket_warms_up_uncached_local_dates(monkeypatch):
+    set_today(monkeypatch, datetime.date(2024, 1, 15))
+    client = FakeHTTPClient()
+    cache = HoroscopeCache(client, api_url='http://stub')
+
+    async def no_delivery(user_ids, due):
+        return {}
+    async def nobody():
+        return {}, {}
+
+    scheduler = DeliveryScheduler(no_delivery, nobody, default_time=None)
+    scheduler.add("1", "07:30 +08:00")
+    scheduler.add("2", "23:30 UTC")
+    cog = SimpleNamespace(horoscope_cache=cache, scheduler=scheduler, _prefetches={})
+    cog._prefetch_day = lambda day: HoroscopeCog._prefetch_day(cog, day)
+    due = datetime.datetime(2024, 1, 15, 23, 30, tzinfo=datetime.timezone.utc)
+
+    async def run():
+        await cache.get('Leo') # 2024-01-15 already has a sign cached, so only the 16th is fetched
+        await HoroscopeCog.prefetch_bucket(cog, ["1", "2"], due)
+        await HoroscopeCog.prefetch_bucket(cog, ["1", "2"], due) # Still in flight: not started twice
+        await asyncio.gather(*cog._prefetches.values())
+
+    asyncio.run(run())
+    assert len(client.requests) == 13
+    assert cache.cached_signs(datetime.date(2024, 1, 16)) == 12
+    assert cache.cached_signs(datetime.date(2024, 1, 15)) == 1
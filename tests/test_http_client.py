@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from src.http_client import HTTPClient, HTTPError
+
+async def start_stub(responses: list):
+    """Serves GET / with the queued (status, body, headers) responses, one per request. Returns (runner, url, hits)."""
+    hits = []
+
+    async def handle(request: web.Request):
+        status, body, headers = responses[min(len(hits), len(responses) - 1)]
+        hits.append(request.query_string)
+        return web.Response(status=status, text=body, headers=headers, content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", hits
+
+def fetch(responses: list, **client_options):
+    """Runs one get_json against a stub; returns (result or raised HTTPError, requests served)."""
+    async def run():
+        runner, url, hits = await start_stub(responses)
+        client = HTTPClient(backoff=0.01, **client_options)
+        await client.start()
+        try:
+            return await client.get_json(url, params={'base': 'EUR'}), hits
+        except HTTPError as e:
+            return e, hits
+        finally:
+            await client.close()
+            await runner.cleanup()
+    return asyncio.run(run())
+
+def test_returns_decoded_json_with_params():
+    result, hits = fetch([(200, '{"rates": {"USD": 1.1}}', {})])
+    assert result == {'rates': {'USD': 1.1}}
+    assert hits == ['base=EUR']
+
+def test_transient_status_is_retried():
+    result, hits = fetch([(503, '', {}), (200, '{"ok": true}', {})])
+    assert result == {'ok': True}
+    assert len(hits) == 2
+
+def test_gives_up_after_max_retries():
+    result, hits = fetch([(500, '', {})], max_retries=2)
+    assert isinstance(result, HTTPError) and result.status == 500
+    assert len(hits) == 3
+
+def test_short_retry_after_is_honoured():
+    result, hits = fetch([(429, '', {'Retry-After': '0'}), (200, '{"ok": true}', {})])
+    assert result == {'ok': True}
+    assert len(hits) == 2
+
+def test_long_retry_after_raises_instead_of_waiting():
+    result, hits = fetch([(429, '', {'Retry-After': '100'}), (200, '{"ok": true}', {})], max_retry_delay=5)
+    assert isinstance(result, HTTPError) and result.status == 429
+    assert len(hits) == 1
+
+def test_client_errors_are_not_retried():
+    result, hits = fetch([(404, '', {})])
+    assert isinstance(result, HTTPError) and result.status == 404
+    assert len(hits) == 1
+
+def test_invalid_json_fails_without_retry():
+    result, hits = fetch([(200, 'not json', {}), (200, '{"ok": true}', {})])
+    assert isinstance(result, HTTPError)
+    assert len(hits) == 1
+
+def test_unstarted_client_raises():
+    with pytest.raises(HTTPError):
+        asyncio.run(HTTPClient().get_json("http://127.0.0.1:9/"))
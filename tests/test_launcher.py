@@ -0,0 +1,52 @@
+import signal
+import time
+
+import pytest
+
+from src.launcher import EXIT_FATAL, ShardLauncher, shard_ranges
+
+@pytest.fixture(autouse=True)
+def keep_test_signal_handlers(monkeypatch):
+    # run() installs its own SIGINT/SIGTERM handlers, which would outlive the test
+    monkeypatch.setattr(signal, 'signal', lambda signum, handler: None)
+
+def test_shard_ranges_are_contiguous_and_balanced():
+    assert shard_ranges(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert shard_ranges(2, 4) == [[0], [1]]
+    assert shard_ranges(3, 0) == [[0, 1, 2]]
+
+def worker_script(tmp_path, exit_code: int) -> str:
+    script = tmp_path / "worker.py"
+    script.write_text(f"import sys\nsys.exit({exit_code})\n")
+    return str(script)
+
+def make_launcher(script: str, **options) -> ShardLauncher:
+    options = {'restart_delay': 0.01, 'max_restart_delay': 0.05, 'max_restarts': 3, 'poll_interval': 0.02, **options}
+    return ShardLauncher(script, shard_count=2, processes=2, **options)
+
+def test_fatal_exit_stops_everything_without_restarts(tmp_path):
+    launcher = make_launcher(worker_script(tmp_path, EXIT_FATAL))
+    assert launcher.run() == EXIT_FATAL
+    assert launcher.spawned == 2
+
+def test_clean_exit_is_not_restarted(tmp_path):
+    launcher = make_launcher(worker_script(tmp_path, 0))
+    assert launcher.run() == 0
+    assert launcher.spawned == 2
+
+def test_crashing_worker_is_restarted_then_given_up_on(tmp_path):
+    launcher = make_launcher(worker_script(tmp_path, 1), max_restarts=2)
+    assert launcher.run() == 1
+    # Each worker starts once and is restarted at most twice before the launcher gives up
+    assert 4 <= launcher.spawned <= 6
+
+def test_restart_delay_backs_off_and_resets_after_a_stable_run(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    launcher = ShardLauncher("worker.py", shard_count=1, processes=1, restart_delay=5, max_restart_delay=30,
+                             max_restarts=5, stable_after=600)
+    launcher._started_at[0] = now[0]
+    assert [launcher.next_restart_delay(0) for _ in range(5)] == [5, 10, 20, 30, 30]
+    assert launcher.next_restart_delay(0) is None
+    now[0] += 601
+    assert launcher.next_restart_delay(0) == 5
@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+
+import pytest
+
+from src import config
+from src.http_client import HTTPError
+from src.rate_cache import RateCache, derive_table, next_publication_after
+
+REFERENCE = {'base': 'EUR', 'date': '2999-01-01', 'rates': {'USD': 1.25, 'MYR': 5.0}}
+
+class FakeHTTPClient:
+    """Answers every request with REFERENCE after `delay` seconds, or raises `error`."""
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def get_json(self, url, params=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return dict(REFERENCE)
+
+def test_derive_table_cross_rates():
+    table = derive_table(REFERENCE, 'USD')
+    assert table['base'] == 'USD'
+    assert table['date'] == REFERENCE['date']
+    assert table['rates']['EUR'] == pytest.approx(0.8)
+    assert table['rates']['MYR'] == pytest.approx(4.0)
+    assert 'USD' not in table['rates']
+
+def test_derive_table_reference_base_and_unknown():
+    assert derive_table(REFERENCE, 'EUR')['rates'] == {'USD': 1.25, 'MYR': 5.0}
+    assert derive_table(REFERENCE, 'XYZ') is None
+
+def test_next_publication_skips_weekend():
+    # 2024-01-05 is a Friday; the next table is due on Monday
+    expected = datetime.datetime.combine(datetime.date(2024, 1, 8), config.RATE_PUBLICATION_TIME_UTC, tzinfo=datetime.timezone.utc)
+    assert next_publication_after('2024-01-05') == expected.timestamp()
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = RateCache(FakeHTTPClient(delay=0.01))
+        tables = await asyncio.gather(*(cache.get_rates(base) for base in ['USD', 'MYR', 'EUR'] * 4))
+        return cache, tables
+
+    cache, tables = asyncio.run(run())
+    assert cache.http_client.calls == 1
+    assert cache.upstream_fetches == 1
+    assert cache.coalesced == 11
+    assert tables[0]['rates']['MYR'] == pytest.approx(4.0)
+
+def test_fresh_table_is_a_hit():
+    async def run():
+        cache = RateCache(FakeHTTPClient())
+        await cache.get_rates('USD')
+        assert cache.is_cached()
+        await cache.get_rates('usd')
+        return cache
+
+    cache = asyncio.run(run())
+    assert (cache.hits, cache.misses, cache.upstream_fetches) == (1, 1, 1)
+
+def test_stale_table_is_served_when_upstream_fails():
+    async def run():
+        cache = RateCache(FakeHTTPClient())
+        await cache.get_rates('USD')
+        cache._expires_at = 0.0 # Force the table out of date
+        cache.http_client.error = HTTPError("down")
+        table = await cache.get_rates('USD')
+        return cache, table
+
+    cache, table = asyncio.run(run())
+    assert table['rates']['MYR'] == pytest.approx(4.0)
+    assert cache.upstream_errors == 1
+    assert cache.is_cached() # Retried after RATE_CACHE_RETRY_TTL, not on every query
+
+def test_failure_without_a_table_raises():
+    cache = RateCache(FakeHTTPClient(error=HTTPError("down")))
+    with pytest.raises(HTTPError):
+        asyncio.run(cache.get_rates('USD'))
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "rate_snapshot.json")
+
+    async def run():
+        cache = RateCache(FakeHTTPClient())
+        await cache.prefetch(['USD'])
+        assert await cache.save_snapshot(path)
+
+        warm = RateCache(FakeHTTPClient())
+        assert await warm.load_snapshot(path)
+        return cache, warm, await warm.get_rates('USD')
+
+    cache, warm, table = asyncio.run(run())
+    assert cache.stats()['cached_bases'] == 1
+    assert warm.http_client.calls == 0
+    assert table['rates']['MYR'] == pytest.approx(4.0)
+    assert warm.stats()['from_snapshot'] is True
+    assert warm.stats()['snapshot_age'] >= 0
+    assert [entry.name for entry in tmp_path.iterdir()] == ["rate_snapshot.json"]
+
+def test_superseded_snapshot_is_served_but_not_current(tmp_path):
+    path = tmp_path / "rate_snapshot.json"
+    path.write_text('{"saved_at": 1, "fetched_at": 1, "reference": {"base": "EUR", "date": "2020-01-06", "rates": {"USD": 2.0}}}')
+    cache = RateCache(FakeHTTPClient())
+    assert asyncio.run(cache.load_snapshot(str(path)))
+    assert cache.is_cached()
+    assert not cache.is_current()
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "rate_snapshot.json"
+    path.write_text('{"reference": ')
+    cache = RateCache(FakeHTTPClient())
+    assert not asyncio.run(cache.load_snapshot(str(path)))
+    assert not asyncio.run(cache.load_snapshot(str(tmp_path / "missing.json")))
+    assert not cache.is_cached()
+
+def test_concurrent_snapshot_writers_never_tear_the_file(tmp_path):
+    path = str(tmp_path / "rate_snapshot.json")
+    cache = RateCache(FakeHTTPClient())
+    asyncio.run(cache.prefetch([]))
+    snapshot = {'saved_at': 1, 'fetched_at': 1, 'reference': REFERENCE}
+
+    async def write_concurrently():
+        await asyncio.gather(*(asyncio.to_thread(cache._write_snapshot, path, snapshot) for _ in range(20)))
+
+    asyncio.run(write_concurrently())
+    assert [entry.name for entry in tmp_path.iterdir()] == ["rate_snapshot.json"]
+    assert asyncio.run(RateCache(FakeHTTPClient()).load_snapshot(path))
+
+@pytest.mark.parametrize('payload', [
+    None,
+    [],
+    {'base': 'EUR', 'rates': {'USD': 1.1}},
+    {'base': 'EUR', 'date': 'yesterday', 'rates': {'USD': 1.1}},
+    {'base': 'EUR', 'date': '2999-01-01', 'rates': {}},
+    {'base': 'EUR', 'date': '2999-01-01', 'rates': {'USD': 'n/a'}},
+    {'base': 'EUR', 'date': '2999-01-01', 'rates': {'USD': 0}},
+    {'base': 'EUR', 'date': '2999-01-01', 'rates': ['USD', 1.1]},
+])
+def test_malformed_payload_is_an_http_error(payload):
+    class MalformedClient(FakeHTTPClient):
+        async def get_json(self, url, params=None):
+            self.calls += 1
+            return payload
+
+    with pytest.raises(HTTPError):
+        asyncio.run(RateCache(MalformedClient()).get_rates('USD'))
+
+def test_prefetch_loop_survives_unexpected_errors(monkeypatch):
+    from types import SimpleNamespace
+    from src.cogs import currency
+
+    attempts = []
+    async def refresh_rates():
+        attempts.append(1)
+        raise TypeError("unexpected payload shape")
+
+    sleeps = []
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 3:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(currency.asyncio, 'sleep', fake_sleep)
+    cog = SimpleNamespace(rate_cache=RateCache(FakeHTTPClient()), refresh_rates=refresh_rates)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(currency.CurrencyCog.prefetch_rates(cog))
+    assert len(attempts) == 3
+    assert sleeps == [config.RATE_CACHE_RETRY_TTL] * 3
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import pytest
+
+from src.ratelimit import TokenBucket
+
+def test_burst_up_to_capacity_then_rejects():
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert not bucket.is_full
+
+def test_refills_at_rate_without_exceeding_capacity(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert bucket.try_acquire(4)
+    assert bucket.time_until(1) == pytest.approx(0.5)
+    now[0] += 1.0
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+    now[0] += 60
+    assert bucket.is_full
+    assert bucket.tokens == 4
+
+def test_acquire_waits_for_a_token():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        started_at = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - started_at
+
+    # One token up front, then two more at 50 per second
+    assert asyncio.run(run()) >= 0.035
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.router import MessageRouter, ROUTE_COMMAND, ROUTE_DM, ROUTE_IGNORED, ROUTE_MENTION, ROUTE_SHORTHAND
+
+BOT_ID = 1
+
+class FakeBotUser:
+    id = BOT_ID
+
+    def mentioned_in(self, message) -> bool:
+        return any(user.id == BOT_ID for user in message.mentions)
+
+def make_router() -> MessageRouter:
+    bot = SimpleNamespace(user=FakeBotUser(), all_commands={'reg': object(), 'help': object()})
+    return MessageRouter(bot, prefix='!')
+
+def make_message(content: str, *, mentions_bot: bool = False, author_bot: bool = False, guild: bool = True):
+    return SimpleNamespace(
+        content=content, author=SimpleNamespace(bot=author_bot), guild=object() if guild else None,
+        mentions=[SimpleNamespace(id=BOT_ID)] if mentions_bot else [], mention_everyone=False,
+    )
+
+@pytest.mark.parametrize('content, mentions_bot, expected', [
+    ("just chatting", False, ROUTE_IGNORED),
+    ("<@1> what is python", True, ROUTE_MENTION),
+    ("!reg", False, ROUTE_COMMAND),
+    ("!reg <@1>", True, ROUTE_COMMAND),
+    ("!usd100 myr", False, ROUTE_SHORTHAND),
+    ("!hey <@1> what is python", True, ROUTE_MENTION),
+    ("!", False, ROUTE_IGNORED),
+])
+def test_classify(content, mentions_bot, expected):
+    assert make_router().classify(make_message(content, mentions_bot=mentions_bot)) == expected
+
+def test_bots_and_dms():
+    router = make_router()
+    assert router.classify(make_message("!reg", author_bot=True)) == ROUTE_IGNORED
+    assert router.classify(make_message("!reg", guild=False)) == ROUTE_DM
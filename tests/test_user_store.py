@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from src.user_store import AsyncUserStore, CachedUserStore, SQLiteUserStore, UserStore
+
+class FlakyStore(SQLiteUserStore):
+    """A SQLite store whose first `failures` batch writes fail."""
+    def __init__(self, path: str, failures: int = 0):
+        super().__init__(path, legacy_json_path=None)
+        self.failures = failures
+        self.batches = []
+        self.closed = False
+
+    def apply_changes(self, changes: dict):
+        self.batches.append(dict(changes))
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        super().apply_changes(changes)
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+def open_cached(tmp_path, failures: int = 0) -> CachedUserStore:
+    return CachedUserStore(AsyncUserStore(FlakyStore(str(tmp_path / "users.db"), failures)), flush_delay=0.01)
+
+def persisted(tmp_path) -> dict:
+    return SQLiteUserStore(str(tmp_path / "users.db"), legacy_json_path=None).all()
+
+def test_incomplete_backend_cannot_be_created():
+    class GetOnly(UserStore):
+        def get(self, user_id):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+def test_burst_of_changes_is_one_batch(tmp_path):
+    async def run():
+        store = open_cached(tmp_path)
+        await store.load()
+        for index in range(50):
+            await store.set(str(index), "Leo")
+        await store.delete("7")
+        assert await store.get("1") == "Leo"
+        await asyncio.sleep(0.05)
+        return store
+
+    store = asyncio.run(run())
+    assert store.flushes == 1
+    assert len(store.store.backend.batches) == 1
+    assert store.pending_changes == 0
+    users = persisted(tmp_path)
+    assert len(users) == 49 and "7" not in users
+
+def test_failed_flush_is_retried(tmp_path):
+    async def run():
+        store = open_cached(tmp_path, failures=1)
+        await store.load()
+        await store.set("1", "Aries")
+        await asyncio.sleep(0.1)
+        return store
+
+    store = asyncio.run(run())
+    assert len(store.store.backend.batches) == 2
+    assert store.pending_changes == 0
+    assert store.flushes == 1
+    assert persisted(tmp_path) == {"1": "Aries"}
+
+def test_changes_made_during_a_failed_flush_are_kept(tmp_path):
+    async def run():
+        store = open_cached(tmp_path, failures=1)
+        await store.load()
+        await store.set("1", "Aries")
+        with pytest.raises(sqlite3.OperationalError):
+            await store.flush()
+        await store.set("1", "Virgo")
+        await store.flush()
+        return store
+
+    asyncio.run(run())
+    assert persisted(tmp_path) == {"1": "Virgo"}
+
+def test_close_flushes_pending_changes(tmp_path):
+    async def run():
+        store = CachedUserStore(AsyncUserStore(FlakyStore(str(tmp_path / "users.db"))), flush_delay=60)
+        await store.load()
+        await store.set("1", "Pisces")
+        assert await store.delete("2") is False
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert store.store.backend.closed
+    assert persisted(tmp_path) == {"1": "Pisces"}
+
+def test_legacy_json_is_imported_once(tmp_path):
+    json_path = tmp_path / "users.json"
+    json_path.write_text('{"1": "Leo", "2": "Aries"}')
+    store = SQLiteUserStore(str(tmp_path / "users.db"), legacy_json_path=str(json_path))
+    assert store.all() == {"1": "Leo", "2": "Aries"}
+    assert not json_path.exists()
+    assert (tmp_path / "users.json.migrated").exists()
+
+def test_losing_a_migration_race_is_harmless(tmp_path, monkeypatch):
+    json_path = tmp_path / "users.json"
+    json_path.write_text('{"1": "Leo"}')
+
+    def renamed_by_another_process(src, dst):
+        raise FileNotFoundError(src)
+
+    monkeypatch.setattr(os, 'replace', renamed_by_another_process)
+    store = SQLiteUserStore(str(tmp_path / "users.db"), legacy_json_path=str(json_path))
+    assert store.all() == {"1": "Leo"}